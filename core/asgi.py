@@ -3,6 +3,18 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Served through ASGI, the game also gets the real-time channel at /eventos/
+(Server-Sent Events, see plataforma.eventos): one in-memory broker per process
+pushes phase changes and the settled number to every connected player.
+The betting views (fazer_aposta, processar_resultado_final) are async, so a
+single worker keeps serving bets while others wait on the database. The
+Procfile runs this application with gunicorn + uvicorn workers.
+
+WhiteNoise's middleware is sync-only and would force the whole middleware
+chain (and the async views) onto a thread, so here it is left out of
+MIDDLEWARE (SERVIDOR_ASGI) and static files are served in front of Django by
+plataforma.estaticos.EstaticosASGI.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -12,5 +24,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+os.environ.setdefault('SERVIDOR_ASGI', '1')
+
+django_application = get_asgi_application()
+
+from plataforma.estaticos import EstaticosASGI  # noqa: E402 (precisa do Django configurado)
 
-application = get_asgi_application()
+application = EstaticosASGI(django_application)
@@ -1,4 +1,5 @@
 import os
+from importlib.util import find_spec
 from pathlib import Path
 import dj_database_url
 
@@ -30,8 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'plataforma.instrumentacao.InstrumentacaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -39,6 +40,16 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+# O WhiteNoiseMiddleware só é síncrono: sob ASGI (core.asgi define SERVIDOR_ASGI)
+# obrigaria toda a cadeia, incluindo as views assíncronas, a correr numa thread.
+# Aí os estáticos são servidos antes do Django por plataforma.estaticos.
+SERVIDOR_ASGI = os.environ.get('SERVIDOR_ASGI') == '1'
+if not SERVIDOR_ASGI:
+    MIDDLEWARE.insert(2, 'whitenoise.middleware.WhiteNoiseMiddleware')
+
+# Instrumentação por pedido (latência, consultas, N+1) exposta em /metricas/.
+# Desligada por omissão; liga com INSTRUMENTACAO=1.
+INSTRUMENTACAO = os.environ.get('INSTRUMENTACAO') == '1'
 
 ROOT_URLCONF = 'core.urls'
 
@@ -61,12 +72,100 @@ TEMPLATES = [
 WSGI_APPLICATION = 'core.wsgi.application'
 
 # --- BANCO DE DADOS ---
+# Em PostgreSQL usa o pool nativo do psycopg 3 (DB_POOL=0 para desligar): as
+# ligações deixam de ser persistentes por worker e o pool verifica cada uma
+# antes de a entregar. Sem pool ficam as ligações persistentes com health checks.
+def _configurar_base(config):
+    if config['ENGINE'] == 'django.db.backends.postgresql' and os.environ.get('DB_POOL', '1') != '0':
+        from psycopg_pool import ConnectionPool
+        config['CONN_MAX_AGE'] = 0
+        config.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+            'timeout': 10,
+            'check': ConnectionPool.check_connection,
+        }
+    else:
+        config['CONN_HEALTH_CHECKS'] = True
+    if config['ENGINE'] == 'django.db.backends.sqlite3':
+        # As transações das apostas leem (rodada aberta?) antes de escrever; em SQLite
+        # uma transação DEFERRED nessas condições falha logo com "database is locked"
+        # em vez de esperar pela vez dela
+        config.setdefault('OPTIONS', {})['transaction_mode'] = 'IMMEDIATE'
+    return config
+
 DATABASES = {
-    'default': dj_database_url.config(
+    'default': _configurar_base(dj_database_url.config(
         default=f'sqlite:///{os.path.join(BASE_DIR, "db.sqlite3")}',
         conn_max_age=600
-    )
+    ))
+}
+# Réplica de leitura (histórico, equipa, listas do admin). Pode ser
+# outro PostgreSQL ou, para testar localmente, outro ficheiro SQLite.
+if os.environ.get('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = _configurar_base(
+        dj_database_url.parse(os.environ['DATABASE_REPLICA_URL'], conn_max_age=600))
+    # Nos testes a réplica é a própria base principal
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['plataforma.roteador.RoteadorReplica']
+
+# --- CACHE ---
+# Por omissão cache local por processo, que só serve para desenvolvimento com um
+# único processo. Em produção REDIS_URL é obrigatório: o agendador de rodadas (worker
+# do Procfile) publica pela cache os resultados, os contadores e as métricas de
+# /metricas/, e os processos web só os veem numa cache partilhada.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Sessões: em ficheiros, partilhados pelos workers da mesma instância. O limite
+    # por omissão do Django (300 entradas) apagaria ao acaso um terço das sessões a
+    # cada escrita acima dele, e o cached_db voltaria a ler da tabela de sessões.
+    # CacheSessoesFicheiros não lista a pasta em cada login: limpa as sessões
+    # expiradas de INTERVALO_LIMPEZA em INTERVALO_LIMPEZA segundos.
+    'sessoes': {
+        'BACKEND': 'plataforma.cache_sessoes.CacheSessoesFicheiros',
+        'LOCATION': os.environ.get('SESSION_CACHE_DIR', '/tmp/jogo-sortudo-sessoes'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('SESSION_CACHE_MAX', 1_000_000)),
+            'INTERVALO_LIMPEZA': 60,
+        },
+    },
+}
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = CACHES['sessoes'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+# --- SESSÕES ---
+# SESSION_MODO: cached_db (omissão) lê a sessão da cache 'sessoes' e só vai à
+# base de dados se ela faltar; signed_cookies guarda-a no cookie assinado (sem
+# base de dados, mas não se pode invalidar no servidor); db é o modo do Django.
+# Medir com `manage.py benchmark_sessoes`.
+SESSION_MODO = os.environ.get('SESSION_MODO', 'cached_db')
+SESSION_ENGINE = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}[SESSION_MODO]
+SESSION_CACHE_ALIAS = 'sessoes'
+# Mensagens ("Depósito enviado!", erros de login) no cookie, sem escritas na sessão
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# --- SENHAS ---
+# HASH_SENHAS escolhe o algoritmo das senhas novas: argon2 (requer argon2-cffi),
+# bcrypt (requer bcrypt) ou pbkdf2. Os outros ficam na lista só para verificar
+# senhas antigas, que são refeitas no login seguinte. Custos: benchmark_hashers.
+HASHERS_SENHAS = {
+    'argon2': 'plataforma.hashers.Argon2Jogo',
+    'bcrypt': 'plataforma.hashers.BCryptJogo',
+    'pbkdf2': 'plataforma.hashers.PBKDF2Jogo',
 }
+HASH_SENHAS = os.environ.get('HASH_SENHAS') or ('argon2' if find_spec('argon2') else 'pbkdf2')
+PASSWORD_HASHERS = [HASHERS_SENHAS[HASH_SENHAS]] + [
+    hasher for nome, hasher in HASHERS_SENHAS.items() if nome != HASH_SENHAS
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
 
 # Validação de Senhas
 AUTH_PASSWORD_VALIDATORS = [
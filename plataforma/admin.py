@@ -1,10 +1,24 @@
 from django.contrib import admin
-from django.db.models import Sum
+from django.db.models import Subquery, Sum
 from django.utils.timezone import now
 from django.utils.html import format_html
-from .models import (Usuario, Deposito, Saque, Aposta, Rodada, 
+from .roteador import ler_da_replica
+from .models import (Usuario, Deposito, Saque, Aposta, Rodada, MovimentoSaldo, TotalApostas, ResumoApostasDiario,
                      ConfiguracaoSistema, MetodoBanco, MetodoExpress, MetodoReferencia)
 
+class LeituraReplicaAdmin(admin.ModelAdmin):
+    """Listas (GET) servidas pela réplica; ações e edições (POST) vão à base principal."""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        with ler_da_replica():
+            resposta = super().changelist_view(request, extra_context)
+            # O TemplateResponse só consulta ao renderizar: renderiza ainda na réplica
+            if hasattr(resposta, 'render'):
+                resposta.render()
+        return resposta
+
 @admin.register(MetodoBanco)
 class MetodoBancoAdmin(admin.ModelAdmin):
     list_display = ('nome_banco', 'titular', 'iban', 'ativo')
@@ -25,68 +39,153 @@ class ConfiguracaoAdmin(admin.ModelAdmin):
     list_display = ('link_whatsapp', 'valores_pre_definidos')
 
 @admin.register(Usuario)
-class UsuarioAdmin(admin.ModelAdmin):
+class UsuarioAdmin(LeituraReplicaAdmin):
     list_display = ('telefone', 'saldo', 'convidado_por', 'pais')
     search_fields = ('telefone',)
 
+@admin.register(MovimentoSaldo)
+class MovimentoSaldoAdmin(LeituraReplicaAdmin):
+    # Extrato imutável: só leitura
+    list_display = ('usuario', 'tipo', 'valor', 'saldo_apos', 'referencia', 'data')
+    list_filter = ('tipo',)
+    list_select_related = ('usuario',)
+    search_fields = ('usuario__telefone', 'referencia')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 @admin.register(Deposito)
-class DepositoAdmin(admin.ModelAdmin):
-    list_display = ('usuario', 'valor', 'metodo', 'status', 'data_criacao')
+class DepositoAdmin(LeituraReplicaAdmin):
+    list_display = ('usuario', 'valor', 'metodo', 'status', 'data_criacao', 'ver_comprovativo')
     list_filter = ('status', 'metodo')
+    list_select_related = ('usuario',)
+    readonly_fields = ('miniatura', 'hash_comprovativo')
     actions = ['aprovar_deposito']
 
+    @admin.display(description="Comprovativo")
+    def ver_comprovativo(self, obj):
+        # Miniatura na lista; o clique abre a versão comprimida
+        if obj.miniatura:
+            return format_html('<a href="{}" target="_blank"><img src="{}" style="max-height: 60px;"></a>',
+                               obj.comprovativo.url, obj.miniatura.url)
+        if obj.comprovativo:
+            return format_html('<a href="{}" target="_blank">Abrir</a>', obj.comprovativo.url)
+        return "-"
+
+    def get_readonly_fields(self, request, obj=None):
+        # Depois de creditado, o valor já não pode mudar
+        if obj is not None and obj.status == 'APROVADO':
+            return self.readonly_fields + ('valor',)
+        return self.readonly_fields
+
     @admin.action(description="Aprovar Depósitos Selecionados")
     def aprovar_deposito(self, request, queryset):
-        count = 0
-        for deposito in queryset.filter(status='PENDENTE'):
-            deposito.status = 'APROVADO'
-            deposito.save() 
-            count += 1
+        count = queryset.aprovar()
         self.message_user(request, f"{count} depósitos aprovados.")
 
 @admin.register(Aposta)
-class ApostaAdmin(admin.ModelAdmin):
+class ApostaAdmin(LeituraReplicaAdmin):
     list_display = ('usuario', 'rodada', 'valor_investido', 'valor_escolhido', 'ganhou')
     list_filter = ('ganhou', 'rodada')
     
+    # Filtros que os totais incrementais (TotalApostas) sabem responder
+    FILTROS_TOTAIS = {'rodada__id__exact', 'ganhou__exact', 'ganhou__isnull', 'o', 'p'}
+
+    def total_entradas(self, request):
+        """
+        Total investido para os filtros atuais, lido de TotalApostas em vez de
+        somar a tabela de apostas. Outros filtros/pesquisas caem no aggregate.
+        """
+        params = request.GET
+        if not set(params) <= self.FILTROS_TOTAIS:
+            queryset = self.get_changelist_instance(request).get_queryset(request)
+            return queryset.aggregate(Sum('valor_investido'))['valor_investido__sum'] or 0
+
+        ganhou = params.get('ganhou__exact')
+        pendentes = params.get('ganhou__isnull') == 'True'
+        rodada_id = params.get('rodada__id__exact')
+
+        if rodada_id:
+            totais = TotalApostas.objects.filter(rodada_id=rodada_id).first()
+            if totais is None:
+                return 0
+            if pendentes:
+                return totais.total_investido - totais.total_vencedoras - totais.total_perdedoras
+        else:
+            # Acumulado das rodadas fechadas + rodadas ainda ativas
+            ativas = TotalApostas.objects.filter(rodada__ativa=True).aggregate(
+                Sum('total_investido'))['total_investido__sum'] or 0
+            if pendentes:
+                return ativas
+            totais = TotalApostas.objects.acumulado()
+            if ganhou is None:
+                return totais.total_investido + ativas
+
+        if ganhou == '1':
+            return totais.total_vencedoras
+        if ganhou == '0':
+            return totais.total_perdedoras
+        return totais.total_investido
+
     def changelist_view(self, request, extra_context=None):
-        entradas = Aposta.objects.aggregate(Sum('valor_investido'))['valor_investido__sum'] or 0
         extra_context = extra_context or {}
-        extra_context['total_entradas'] = entradas
+        extra_context['total_entradas'] = self.total_entradas(request)
         return super().changelist_view(request, extra_context=extra_context)
 
 @admin.register(Rodada)
-class RodadaAdmin(admin.ModelAdmin):
+class RodadaAdmin(LeituraReplicaAdmin):
     list_display = ('id', 'numero_sorteado', 'ativa', 'data_inicio')
 
+@admin.register(ResumoApostasDiario)
+class ResumoApostasDiarioAdmin(LeituraReplicaAdmin):
+    list_display = ('usuario', 'dia', 'quantidade', 'vitorias', 'total_investido', 'total_ganho')
+    date_hierarchy = 'dia'
+    search_fields = ('usuario__telefone',)
+    list_select_related = ('usuario',)
+    readonly_fields = ('usuario', 'dia', 'quantidade', 'vitorias', 'total_investido', 'total_ganho')
+
 @admin.register(Saque)
-class SaqueAdmin(admin.ModelAdmin):
+class SaqueAdmin(LeituraReplicaAdmin):
     # 'dados_para_pagamento' aparecerá na sua lista de saques
     list_display = ('usuario', 'valor', 'dados_para_pagamento', 'status', 'data_pedido')
     list_filter = ('status',)
     list_editable = ('status',)
     search_fields = ('usuario__telefone',)
 
-    def dados_para_pagamento(self, obj):
+    list_select_related = ('usuario',)
+
+    def get_queryset(self, request):
         """
-        Esta lógica busca nos seus modelos de Métodos o que enviar para o admin.
-        Como o Saque não salva o IBAN, buscamos os métodos ATIVOS do sistema.
+        Como o Saque não salva o IBAN, mostramos os métodos ATIVOS do sistema.
+        São subconsultas sem correlação: a base de dados resolve-as uma vez por
+        página, em vez de 2 consultas por linha.
         """
-        # 1. Tenta buscar dados de Banco ativos
-        banco = MetodoBanco.objects.filter(ativo=True).first()
-        if banco:
+        bancos = MetodoBanco.objects.filter(ativo=True).order_by('pk')
+        express = MetodoExpress.objects.filter(ativo=True).order_by('pk')
+        return super().get_queryset(request).annotate(
+            banco_nome=Subquery(bancos.values('nome_banco')[:1]),
+            banco_titular=Subquery(bancos.values('titular')[:1]),
+            banco_iban=Subquery(bancos.values('iban')[:1]),
+            express_numero=Subquery(express.values('numero_telefone')[:1]),
+        )
+
+    def dados_para_pagamento(self, obj):
+        # 1. Dados de Banco ativos
+        if obj.banco_nome is not None:
             return format_html(
                 '<b style="color: #2e7d32;">🏦 BANCO:</b> {}<br>'
                 '<b>Titular:</b> {}<br><b>IBAN:</b> {}',
-                banco.nome_banco, banco.titular, banco.iban
+                obj.banco_nome, obj.banco_titular, obj.banco_iban
             )
 
-        # 2. Se não houver banco ativo, tenta Express
-        express = MetodoExpress.objects.filter(ativo=True).first()
-        if express:
+        # 2. Se não houver banco ativo, Express
+        if obj.express_numero is not None:
             return format_html(
                 '<b style="color: #1976d2;">📱 EXPRESS:</b> {}',
-                express.numero_telefone
+                obj.express_numero
             )
 
         return format_html('<span style="color: red;">Cadastre um método no Admin!</span>')
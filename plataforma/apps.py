@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class PlataformaConfig(AppConfig):
     name = 'plataforma'
+
+    def ready(self):
+        from . import signals  # noqa: F401
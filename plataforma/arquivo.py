@@ -0,0 +1,90 @@
+"""
+Arquivo das rodadas antigas: as apostas de rodadas liquidadas há mais de N
+dias passam a uma linha por jogador e por dia (ResumoApostasDiario) e as
+linhas originais são apagadas. Cada lote corre na sua própria transação
+curta, por isso o processo pode ser interrompido e retomado a qualquer momento.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .liquidacao import multiplicador
+from .models import Aposta, ResumoApostasDiario, Rodada
+
+CAMPOS_RESUMO = ('quantidade', 'vitorias', 'total_investido', 'total_ganho')
+
+
+@dataclass
+class ResultadoArquivo:
+    rodadas: int = 0
+    apostas: int = 0
+    resumos: int = 0
+
+
+def corte_em_dias(dias):
+    """Início do dia local de há `dias` dias: só se arquivam dias completos."""
+    hoje = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    return hoje - timedelta(days=dias)
+
+
+def _agregar(rodada_ids):
+    """{(usuario_id, dia): [quantidade, vitorias, investido, ganho]} das apostas das rodadas."""
+    grupos = (Aposta.objects.filter(rodada_id__in=rodada_ids).order_by()
+              .values_list('usuario_id', TruncDate('rodada__data_inicio'), 'valor_escolhido', 'ganhou')
+              .annotate(n=Count('id'), total=Sum('valor_investido')))
+    resumos = {}
+    for usuario_id, dia, opcao, ganhou, n, total in grupos:
+        linha = resumos.setdefault((usuario_id, dia), [0, 0, Decimal(0), Decimal(0)])
+        linha[0] += n
+        linha[2] += total
+        if ganhou:
+            linha[1] += n
+            linha[3] += total * multiplicador(opcao)
+    return resumos
+
+
+def arquivar_lote(corte, lote):
+    """
+    Arquiva até `lote` rodadas liquidadas antes de `corte`: soma as apostas aos
+    resumos diários e apaga as apostas, os totais da rodada e a rodada.
+    Devolve None quando já não há rodadas a arquivar.
+    """
+    with transaction.atomic():
+        # skip_locked: dois processos em simultâneo nunca arquivam a mesma rodada
+        rodada_ids = list(Rodada.objects.select_for_update(skip_locked=True)
+                          .filter(ativa=False, numero_sorteado__isnull=False, data_inicio__lt=corte)
+                          .order_by('id').values_list('id', flat=True)[:lote])
+        if not rodada_ids:
+            return None
+
+        agregado = _agregar(rodada_ids)
+        existentes = {
+            (resumo.usuario_id, resumo.dia): resumo
+            for resumo in ResumoApostasDiario.objects.select_for_update().filter(
+                usuario_id__in={usuario_id for usuario_id, _ in agregado},
+                dia__in={dia for _, dia in agregado},
+            )
+        }
+        novos, alterados = [], []
+        for (usuario_id, dia), valores in agregado.items():
+            resumo = existentes.get((usuario_id, dia))
+            if resumo is None:
+                novos.append(ResumoApostasDiario(usuario_id=usuario_id, dia=dia,
+                                                 **dict(zip(CAMPOS_RESUMO, valores))))
+                continue
+            for campo, valor in zip(CAMPOS_RESUMO, valores):
+                setattr(resumo, campo, getattr(resumo, campo) + valor)
+            alterados.append(resumo)
+        ResumoApostasDiario.objects.bulk_create(novos)
+        ResumoApostasDiario.objects.bulk_update(alterados, CAMPOS_RESUMO)
+
+        # Sem sinais nem dependentes: um único DELETE por tabela
+        apostas, _ = Aposta.objects.filter(rodada_id__in=rodada_ids).delete()
+        Rodada.objects.filter(id__in=rodada_ids).delete()
+
+    return ResultadoArquivo(rodadas=len(rodada_ids), apostas=apostas, resumos=len(agregado))
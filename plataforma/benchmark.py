@@ -0,0 +1,162 @@
+"""
+Utilitários partilhados pelos comandos de benchmark. Tudo corre numa base de
+dados de teste criada à parte e com uma cache local (as sessões em ficheiros
+numa pasta temporária), para nunca tocar nos dados nem na cache de produção.
+"""
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test.utils import (
+    override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.utils.module_loading import import_string
+
+from .liquidacao import OPCOES
+from .models import Usuario
+
+CACHE_BENCHMARK = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    },
+    'sessoes': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark-sessoes',
+    },
+}
+
+
+@contextmanager
+def banco_de_teste():
+    """
+    Cria a base de dados de teste (como o `manage.py test`) e apaga-a no fim.
+    Os ficheiros enviados (comprovativos) vão para uma pasta temporária.
+    """
+    if connection.vendor == 'sqlite':
+        # Em memória as threads partilhariam uma cache SQLite com bloqueios por tabela
+        connection.settings_dict['TEST']['NAME'] = 'benchmark.sqlite3'
+    nome_original = connection.settings_dict['NAME']
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with tempfile.TemporaryDirectory() as media, tempfile.TemporaryDirectory() as sessoes:
+            caches = dict(CACHE_BENCHMARK)
+            if issubclass(import_string(settings.CACHES['sessoes']['BACKEND']), FileBasedCache):
+                # Mesma configuração de produção (limite de entradas incluído), noutra pasta
+                caches['sessoes'] = {**settings.CACHES['sessoes'], 'LOCATION': sessoes}
+            with override_settings(CACHES=caches, MEDIA_ROOT=media):
+                yield
+    finally:
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def fase_de_apostas(ciclo=1):
+    """Fixa o relógio na fase de apostas, para a medição não depender do segundo em que arranca."""
+    with mock.patch('plataforma.views.estado_ciclo', return_value=(ciclo, "APOSTA", 30)):
+        yield
+
+
+@contextmanager
+def latencia_simulada(milissegundos):
+    """
+    Acrescenta um atraso a cada consulta, em todas as ligações (incluindo as
+    das threads do sync_to_async), para imitar a distância à base de dados
+    gerida em produção. Com 0 não altera nada.
+    """
+    if not milissegundos:
+        yield
+        return
+
+    def atrasar(execute, sql, params, many, context):
+        time.sleep(milissegundos / 1000)
+        return execute(sql, params, many, context)
+
+    def instalar(sender, connection, **kwargs):
+        connection.execute_wrappers.append(atrasar)
+
+    connection_created.connect(instalar)
+    try:
+        with connection.execute_wrapper(atrasar):
+            yield
+    finally:
+        connection_created.disconnect(instalar)
+
+
+def criar_jogadores(quantidade, saldo=Decimal('1000000')):
+    inicio = Usuario.objects.count()
+    return Usuario.objects.bulk_create([
+        Usuario(telefone=f'99{inicio + i:07d}', saldo=saldo) for i in range(quantidade)
+    ])
+
+
+def dados_aposta(indice, valor='100'):
+    """Dados do formulário de /apostar/, a rodar pelas opções do dado."""
+    return {'numero_escolhido': OPCOES[indice % len(OPCOES)], 'valor_investido': valor}
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+class Medicao:
+    """Latências de um tipo de pedido, registadas por várias threads ao mesmo tempo."""
+
+    def __init__(self):
+        self.latencias = []
+        self.erros = 0
+        self._trinco = threading.Lock()
+
+    def medir(self, enviar, sucesso=(200,)):
+        """Envia o pedido (`enviar()` devolve a resposta) e regista quanto demorou."""
+        inicio = time.perf_counter()
+        resposta = enviar()
+        self.registar(time.perf_counter() - inicio, resposta.status_code in sucesso)
+        return resposta
+
+    def registar(self, latencia, ok):
+        with self._trinco:
+            self.latencias.append(latencia)
+            self.erros += not ok
+
+    def resumo(self, duracao):
+        return {
+            'pedidos': len(self.latencias),
+            'erros': self.erros,
+            'duracao_s': round(duracao, 3),
+            'por_segundo': round((len(self.latencias) - self.erros) / duracao, 1) if duracao else 0.0,
+            'p50_ms': round(percentil(self.latencias, 50) * 1000, 1),
+            'p99_ms': round(percentil(self.latencias, 99) * 1000, 1),
+        }
+
+
+def em_paralelo(funcao, argumentos, concorrencia):
+    """
+    Corre funcao(argumento) para cada argumento em `concorrencia` threads
+    (um jogador por thread) e devolve a duração total em segundos. Cada thread
+    fecha a sua ligação no fim, para a base de teste poder ser apagada.
+    """
+    def correr(argumento):
+        try:
+            funcao(argumento)
+        finally:
+            connections.close_all()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(correr, argumentos))
+    return time.perf_counter() - inicio
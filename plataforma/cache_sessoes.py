@@ -0,0 +1,57 @@
+"""
+Cache de sessões em ficheiros sem o custo do FileBasedCache a cada escrita: o
+Django lista a pasta inteira (glob) em cada set() para ver se passou do limite,
+e os ficheiros expirados só saem quando alguém os volta a ler. Aqui a pasta é
+limpa no máximo uma vez por INTERVALO_LIMPEZA segundos: saem os ficheiros mais
+velhos que a idade máxima da sessão e, se ainda passar de MAX_ENTRIES, o corte
+ao acaso do Django.
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class CacheSessoesFicheiros(FileBasedCache):
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._intervalo_limpeza = params.get('OPTIONS', {}).get('INTERVALO_LIMPEZA', 60)
+        self._proxima_limpeza = 0
+        self._a_limpar = threading.Lock()
+
+    def _cull(self):
+        if time.monotonic() < self._proxima_limpeza or not self._a_limpar.acquire(blocking=False):
+            return
+        try:
+            self._proxima_limpeza = time.monotonic() + self._intervalo_limpeza
+            if self.limpar_expirados() >= self._max_entries:
+                super()._cull()
+        finally:
+            self._a_limpar.release()
+
+    def limpar_expirados(self):
+        """
+        Apaga as sessões escritas há mais de SESSION_COOKIE_AGE (a validade de
+        cada sessão na cache nunca passa disso) e devolve quantas ficaram.
+        Só lê a data de modificação, sem abrir os ficheiros.
+        """
+        limite = time.time() - settings.SESSION_COOKIE_AGE
+        restantes = 0
+        try:
+            entradas = list(os.scandir(self._dir))
+        except FileNotFoundError:
+            return 0
+        for entrada in entradas:
+            if not entrada.name.endswith(self.cache_suffix):
+                continue
+            try:
+                expirado = entrada.stat().st_mtime < limite
+            except FileNotFoundError:
+                continue
+            if expirado:
+                self._delete(entrada.path)
+            else:
+                restantes += 1
+        return restantes
@@ -0,0 +1,91 @@
+import time
+
+from django.core.cache import cache
+
+from .models import Rodada
+
+# Todos os jogadores seguem o mesmo relógio do servidor:
+# 0-30 segundos: Fase de Apostas. 30-40 segundos: Fase de Sorteio/Resultado.
+DURACAO_CICLO = 40
+FIM_APOSTAS = 30
+
+
+def ciclo_atual(agora=None):
+    if agora is None:
+        agora = time.time()
+    return int(agora) // DURACAO_CICLO
+
+
+def inicio_do_ciclo(ciclo):
+    return ciclo * DURACAO_CICLO
+
+
+def estado_ciclo(agora=None):
+    """Devolve (ciclo, fase, tempo_restante) para o instante indicado."""
+    if agora is None:
+        agora = time.time()
+    agora = int(agora)
+    tempo_no_ciclo = agora % DURACAO_CICLO
+    if tempo_no_ciclo < FIM_APOSTAS:
+        return ciclo_atual(agora), "APOSTA", FIM_APOSTAS - tempo_no_ciclo
+    return ciclo_atual(agora), "SORTEIO", DURACAO_CICLO - tempo_no_ciclo
+
+
+# Registo em memória da rodada do ciclo corrente: {ciclo: Rodada}
+_rodada_do_ciclo = {}
+
+
+def _chave_cache(ciclo):
+    return f'rodada:ciclo:{ciclo}'
+
+
+def abrir_rodada(ciclo):
+    """Busca ou cria a rodada do ciclo. A restrição unique em `ciclo` evita duplicados."""
+    rodada, _ = Rodada.objects.get_or_create(ciclo=ciclo, defaults={'ativa': True})
+    return rodada
+
+
+async def aabrir_rodada(ciclo):
+    rodada, _ = await Rodada.objects.aget_or_create(ciclo=ciclo, defaults={'ativa': True})
+    return rodada
+
+
+def _guardar_em_memoria(ciclo, rodada):
+    # Só interessa guardar o ciclo corrente; os anteriores são descartados
+    _rodada_do_ciclo.clear()
+    _rodada_do_ciclo[ciclo] = rodada
+    return rodada
+
+
+def rodada_do_ciclo(ciclo):
+    """
+    Resolve a rodada do ciclo sem ir à base de dados sempre que possível:
+    memória do processo -> cache do Django -> abrir_rodada().
+    """
+    rodada = _rodada_do_ciclo.get(ciclo)
+    if rodada is not None:
+        return rodada
+
+    rodada = cache.get(_chave_cache(ciclo))
+    if rodada is None:
+        rodada = abrir_rodada(ciclo)
+        cache.set(_chave_cache(ciclo), rodada, DURACAO_CICLO * 2)
+    return _guardar_em_memoria(ciclo, rodada)
+
+
+async def arodada_do_ciclo(ciclo):
+    """Versão assíncrona de rodada_do_ciclo(), para as views servidas por ASGI."""
+    rodada = _rodada_do_ciclo.get(ciclo)
+    if rodada is not None:
+        return rodada
+
+    rodada = await cache.aget(_chave_cache(ciclo))
+    if rodada is None:
+        rodada = await aabrir_rodada(ciclo)
+        await cache.aset(_chave_cache(ciclo), rodada, DURACAO_CICLO * 2)
+    return _guardar_em_memoria(ciclo, rodada)
+
+
+def invalidar_rodada(ciclo):
+    _rodada_do_ciclo.pop(ciclo, None)
+    cache.delete(_chave_cache(ciclo))
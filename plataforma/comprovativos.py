@@ -0,0 +1,97 @@
+"""
+Pipeline dos comprovativos de depósito: reduz a imagem enviada (capturas de
+ecrã do telemóvel) para WebP com tamanho limitado, gera uma miniatura para a
+lista do admin e deduplica envios iguais pelo hash do conteúdo. Corre numa
+thread à parte depois do commit, fora do pedido do jogador.
+"""
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from .models import Deposito
+
+logger = logging.getLogger(__name__)
+
+LADO_MAXIMO = 1600
+LADO_MINIATURA = 160
+QUALIDADE = 80
+# WebP quando o Pillow o suporta; caso contrário JPEG
+FORMATO, EXTENSAO = ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='comprovativos')
+
+
+def hash_conteudo(ficheiro):
+    sha = hashlib.sha256()
+    ficheiro.seek(0)
+    for bloco in ficheiro.chunks():
+        sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _codificar(imagem, lado):
+    copia = imagem.copy()
+    copia.thumbnail((lado, lado))
+    saida = io.BytesIO()
+    copia.save(saida, FORMATO, quality=QUALIDADE, optimize=True)
+    return saida.getvalue()
+
+
+def processar_comprovativo(deposito_id):
+    """
+    Substitui o original pela versão comprimida e cria a miniatura. Os nomes
+    dos ficheiros são o hash do original: um comprovativo repetido aponta para
+    os ficheiros já existentes e o original duplicado é apagado.
+    """
+    deposito = Deposito.objects.filter(id=deposito_id).only('comprovativo', 'hash_comprovativo').first()
+    if deposito is None or not deposito.comprovativo or deposito.hash_comprovativo:
+        return
+
+    original = deposito.comprovativo
+    storage = original.storage
+    with original.open('rb'):
+        conteudo_hash = hash_conteudo(original)
+        nome = f'comprovativos/{conteudo_hash}.{EXTENSAO}'
+        nome_miniatura = f'comprovativos/miniaturas/{conteudo_hash}.{EXTENSAO}'
+        if not (storage.exists(nome) and storage.exists(nome_miniatura)):
+            try:
+                original.seek(0)
+                with Image.open(original) as imagem:
+                    imagem = ImageOps.exif_transpose(imagem).convert('RGB')
+                    comprimido = _codificar(imagem, LADO_MAXIMO)
+                    miniatura = _codificar(imagem, LADO_MINIATURA)
+            except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+                # Marcado com o hash: processar_comprovativos não volta a tentar
+                logger.warning("Comprovativo do depósito %s não é uma imagem válida", deposito_id)
+                Deposito.objects.filter(id=deposito_id).update(hash_comprovativo=conteudo_hash)
+                return
+            if not storage.exists(nome):
+                nome = storage.save(nome, ContentFile(comprimido))
+            if not storage.exists(nome_miniatura):
+                nome_miniatura = storage.save(nome_miniatura, ContentFile(miniatura))
+
+    Deposito.objects.filter(id=deposito_id).update(
+        comprovativo=nome, miniatura=nome_miniatura, hash_comprovativo=conteudo_hash,
+    )
+    if original.name != nome:
+        storage.delete(original.name)
+
+
+def _processar_em_thread(deposito_id):
+    close_old_connections()
+    try:
+        processar_comprovativo(deposito_id)
+    except Exception:
+        logger.exception("Falha ao processar o comprovativo do depósito %s", deposito_id)
+    finally:
+        close_old_connections()
+
+
+def agendar_processamento(deposito_id):
+    """Processa o comprovativo numa thread de fundo, só depois de o depósito estar gravado."""
+    transaction.on_commit(lambda: _executor.submit(_processar_em_thread, deposito_id))
@@ -0,0 +1,74 @@
+import time
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ConfiguracaoSistema, MetodoBanco, MetodoExpress, MetodoReferencia
+
+CHAVE_VERSAO = 'configuracao:versao'
+# Rede de segurança para caches locais por processo, que não recebem a invalidação dos outros
+VALIDADE = 300
+
+
+@dataclass(frozen=True)
+class Configuracao:
+    config: ConfiguracaoSistema | None
+    bancos: list
+    express: list
+    referencias: list
+    valores_pre: list
+
+
+def _valores_pre_definidos(config):
+    valores = []
+    for valor in (config.valores_pre_definidos.split(',') if config else []):
+        try:
+            valores.append(int(valor.strip()))
+        except ValueError:
+            continue
+    return valores
+
+
+def _carregar():
+    # Lê sempre da base principal: logo depois de uma alteração uma réplica atrasada
+    # devolveria a configuração antiga, que ficaria na cache sob a versão nova
+    config = ConfiguracaoSistema.objects.first()
+    return Configuracao(
+        config=config,
+        bancos=list(MetodoBanco.objects.filter(ativo=True)),
+        express=list(MetodoExpress.objects.filter(ativo=True)),
+        referencias=list(MetodoReferencia.objects.filter(ativo=True)),
+        valores_pre=_valores_pre_definidos(config),
+    )
+
+
+def obter_configuracao():
+    """
+    Configuração do sistema e métodos de pagamento ativos, guardados na cache
+    sob uma chave versionada. Só vai à base de dados depois de uma alteração.
+    """
+    versao = cache.get_or_set(CHAVE_VERSAO, time.time_ns, None)
+    chave = f'configuracao:{versao}'
+    dados = cache.get(chave)
+    if dados is None:
+        dados = _carregar()
+        cache.set(chave, dados, VALIDADE)
+    return dados
+
+
+def _nova_versao():
+    try:
+        cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        # A versão não estava na cache: começa uma nova que não colide com as anteriores
+        cache.set(CHAVE_VERSAO, time.time_ns(), None)
+
+
+def invalidar_configuracao(using=None, **kwargs):
+    """
+    Recetor de post_save/post_delete: passa para uma nova versão da configuração.
+    Só depois do commit; antes disso um pedido concorrente ainda leria as linhas
+    antigas e guardá-las-ia na cache sob a versão nova.
+    """
+    transaction.on_commit(_nova_versao, using=using)
@@ -0,0 +1,60 @@
+"""
+Ficheiros estáticos sob ASGI. O WhiteNoiseMiddleware só funciona em modo
+síncrono: na cadeia de middleware obriga o Django a passar cada pedido (e as
+views assíncronas de apostas) por uma thread. Sob core.asgi o WhiteNoise sai
+do MIDDLEWARE e os estáticos são servidos aqui, antes do Django, com o mesmo
+índice de ficheiros e os mesmos cabeçalhos (cache, compressão, ETag).
+"""
+import asyncio
+
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+BLOCO = 64 * 1024
+
+
+def _meta(scope):
+    """Cabeçalhos do pedido no formato do WSGI (HTTP_ACCEPT_ENCODING, ...), como o WhiteNoise espera."""
+    meta = {}
+    for nome, valor in scope.get('headers', ()):
+        chave = 'HTTP_' + nome.decode('latin-1').upper().replace('-', '_')
+        meta[chave] = valor.decode('latin-1')
+    return meta
+
+
+class EstaticosASGI:
+    def __init__(self, application):
+        self.application = application
+        # Reaproveita a configuração WHITENOISE_* / STATIC_* e o índice de ficheiros
+        self.whitenoise = WhiteNoiseMiddleware()
+
+    def procurar(self, caminho):
+        if not caminho.startswith(self.whitenoise.static_prefix):
+            return None
+        if self.whitenoise.autorefresh:
+            return self.whitenoise.find_file(caminho)
+        return self.whitenoise.files.get(caminho)
+
+    async def __call__(self, scope, receive, send):
+        ficheiro = self.procurar(scope['path']) if scope['type'] == 'http' else None
+        if ficheiro is None:
+            return await self.application(scope, receive, send)
+
+        resposta = ficheiro.get_response(scope['method'], _meta(scope))
+        await send({
+            'type': 'http.response.start',
+            'status': int(resposta.status),
+            'headers': [(nome.lower().encode('latin-1'), str(valor).encode('latin-1'))
+                        for nome, valor in resposta.headers],
+        })
+        if resposta.file is None:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        try:
+            while True:
+                bloco = await asyncio.to_thread(resposta.file.read, BLOCO)
+                mais = len(bloco) == BLOCO
+                await send({'type': 'http.response.body', 'body': bloco, 'more_body': mais})
+                if not mais:
+                    break
+        finally:
+            resposta.file.close()
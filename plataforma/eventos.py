@@ -0,0 +1,70 @@
+import asyncio
+import json
+import time
+
+from .ciclo import DURACAO_CICLO, FIM_APOSTAS, estado_ciclo, inicio_do_ciclo
+from .models import Rodada
+
+# Intervalo entre tentativas de ler o resultado enquanto a rodada não está liquidada
+INTERVALO_RESULTADO = 1
+
+
+def formatar_evento(evento, dados):
+    return f"event: {evento}\ndata: {json.dumps(dados)}\n\n"
+
+
+class Difusor:
+    """
+    Broker em memória (um por processo ASGI). Uma única tarefa segue o relógio
+    de 40s, lê o resultado da rodada uma vez por ciclo e entrega-o a todos os
+    subscritores, em vez de cada jogador fazer o seu próprio pedido.
+    """
+
+    def __init__(self):
+        self.subscritores = set()
+        self.ultimos = {}
+        self.tarefa = None
+
+    def subscrever(self):
+        fila = asyncio.Queue(maxsize=10)
+        self.subscritores.add(fila)
+        if self.tarefa is None or self.tarefa.done():
+            self.tarefa = asyncio.get_running_loop().create_task(self._relogio())
+        return fila
+
+    def cancelar(self, fila):
+        self.subscritores.discard(fila)
+
+    def publicar(self, evento, dados):
+        self.ultimos[evento] = dados
+        for fila in list(self.subscritores):
+            try:
+                fila.put_nowait((evento, dados))
+            except asyncio.QueueFull:
+                # Cliente lento: perde este evento, recebe o próximo
+                pass
+
+    async def _relogio(self):
+        while self.subscritores:
+            ciclo, fase, restante = estado_ciclo()
+            self.publicar('fase', {'ciclo': ciclo, 'fase': fase, 'restante': restante})
+            if fase == "SORTEIO":
+                await self._publicar_resultado(ciclo)
+            proxima_fase = inicio_do_ciclo(ciclo) + (FIM_APOSTAS if fase == "APOSTA" else DURACAO_CICLO)
+            await asyncio.sleep(max(proxima_fase - time.time(), 0))
+
+    async def _publicar_resultado(self, ciclo):
+        fim_do_ciclo = inicio_do_ciclo(ciclo) + DURACAO_CICLO
+        while self.subscritores and time.time() < fim_do_ciclo:
+            rodada = await (Rodada.objects.filter(ciclo=ciclo, numero_sorteado__isnull=False)
+                            .values('id', 'numero_sorteado').afirst())
+            if rodada is not None:
+                self.publicar('resultado', {
+                    'ciclo': ciclo, 'rodada_id': rodada['id'],
+                    'numero_sorteado': rodada['numero_sorteado'],
+                })
+                return
+            await asyncio.sleep(INTERVALO_RESULTADO)
+
+
+difusor = Difusor()
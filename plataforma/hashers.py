@@ -0,0 +1,26 @@
+"""
+Hashers de senha com custos afinados para as instâncias pequenas onde o jogo
+corre. O algoritmo das senhas novas escolhe-se em settings (HASH_SENHAS) e os
+custos medem-se com `manage.py benchmark_hashers`. Os hashers mantêm o nome do
+algoritmo do Django: uma senha guardada com outro algoritmo ou outros custos é
+refeita de forma transparente no login seguinte.
+"""
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, BCryptSHA256PasswordHasher, PBKDF2PasswordHasher,
+)
+
+
+class Argon2Jogo(Argon2PasswordHasher):
+    # Perfil mínimo recomendado pela OWASP: 19 MiB, 2 passagens, 1 thread
+    time_cost = 2
+    memory_cost = 19456
+    parallelism = 1
+
+
+class BCryptJogo(BCryptSHA256PasswordHasher):
+    rounds = 10
+
+
+class PBKDF2Jogo(PBKDF2PasswordHasher):
+    # Recomendação OWASP para PBKDF2-SHA256 (o Django usa 1 000 000)
+    iterations = 600_000
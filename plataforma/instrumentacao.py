@@ -0,0 +1,190 @@
+"""
+Instrumentação opcional por pedido (settings.INSTRUMENTACAO): latência de cada
+view, número de consultas, tempo total em SQL e consultas repetidas no mesmo
+pedido (assinatura típica de N+1). Os números ficam em memória no processo e
+são expostos em formato Prometheus em /metricas/ (só staff).
+"""
+import bisect
+import contextvars
+import re
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Limites (segundos) do histograma de latência
+LIMITES_LATENCIA = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# Máximo de assinaturas N+1 guardadas, para a memória não crescer sem fim
+MAX_ASSINATURAS = 50
+
+_consultas_do_pedido = contextvars.ContextVar('consultas_do_pedido', default=None)
+
+_LISTA_IN = re.compile(r'IN \((?:%s, )*%s\)')
+_ESPACOS = re.compile(r'\s+')
+
+
+def assinatura(sql):
+    """SQL normalizado: o mesmo SELECT com listas IN de tamanhos diferentes conta como um."""
+    return _LISTA_IN.sub('IN (...)', _ESPACOS.sub(' ', sql))[:200]
+
+
+class ConsultasDoPedido:
+    __slots__ = ('total', 'tempo_sql', 'assinaturas')
+
+    def __init__(self):
+        self.total = 0
+        self.tempo_sql = 0.0
+        self.assinaturas = Counter()
+
+    def repetidas(self):
+        return {sql: n for sql, n in self.assinaturas.items() if n > 1}
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    consultas = _consultas_do_pedido.get()
+    if consultas is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        consultas.total += 1
+        consultas.tempo_sql += time.perf_counter() - inicio
+        consultas.assinaturas[sql] += 1
+
+
+def _instalar(sender=None, connection=None, **kwargs):
+    # As ligações das threads do sync_to_async são criadas depois; o sinal apanha-as
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_consulta)
+
+
+class Registo:
+    """Totais por view (nome da rota), partilhados pelas threads do processo."""
+
+    def __init__(self):
+        self._trinco = threading.Lock()
+        self.vistas = {}
+        self.assinaturas = Counter()
+
+    def registar(self, vista, latencia, consultas):
+        with self._trinco:
+            totais = self.vistas.get(vista)
+            if totais is None:
+                totais = self.vistas[vista] = {
+                    'pedidos': 0, 'latencia': 0.0, 'consultas': 0, 'tempo_sql': 0.0,
+                    'repetidas': 0, 'histograma': [0] * (len(LIMITES_LATENCIA) + 1),
+                }
+            totais['pedidos'] += 1
+            totais['latencia'] += latencia
+            totais['consultas'] += consultas.total
+            totais['tempo_sql'] += consultas.tempo_sql
+            totais['histograma'][bisect.bisect_left(LIMITES_LATENCIA, latencia)] += 1
+            for sql, n in consultas.repetidas().items():
+                totais['repetidas'] += n - 1
+                chave = (vista, assinatura(sql))
+                if chave in self.assinaturas or len(self.assinaturas) < MAX_ASSINATURAS:
+                    self.assinaturas[chave] += n - 1
+
+    def limpar(self):
+        with self._trinco:
+            self.vistas.clear()
+            self.assinaturas.clear()
+
+    def prometheus(self):
+        with self._trinco:
+            vistas = {vista: dict(totais, histograma=list(totais['histograma']))
+                      for vista, totais in self.vistas.items()}
+            assinaturas = dict(self.assinaturas)
+
+        linhas = [
+            '# HELP jogo_pedido_segundos Latência dos pedidos por view.',
+            '# TYPE jogo_pedido_segundos histogram',
+        ]
+        for vista, totais in sorted(vistas.items()):
+            acumulado = 0
+            for limite, n in zip(LIMITES_LATENCIA + ('+Inf',), totais['histograma']):
+                acumulado += n
+                linhas.append(f'jogo_pedido_segundos_bucket{{view="{_rotulo(vista)}",le="{limite}"}} {acumulado}')
+            linhas.append(f'jogo_pedido_segundos_sum{{view="{_rotulo(vista)}"}} {totais["latencia"]:.6f}')
+            linhas.append(f'jogo_pedido_segundos_count{{view="{_rotulo(vista)}"}} {totais["pedidos"]}')
+
+        for nome, campo, tipo, ajuda in (
+            ('jogo_consultas_total', 'consultas', 'counter', 'Consultas SQL por view.'),
+            ('jogo_sql_segundos_total', 'tempo_sql', 'counter', 'Tempo gasto em SQL por view.'),
+            ('jogo_consultas_repetidas_total', 'repetidas', 'counter',
+             'Consultas repetidas dentro do mesmo pedido (N+1).'),
+        ):
+            linhas += [f'# HELP {nome} {ajuda}', f'# TYPE {nome} {tipo}']
+            for vista, totais in sorted(vistas.items()):
+                valor = totais[campo]
+                valor = f'{valor:.6f}' if isinstance(valor, float) else valor
+                linhas.append(f'{nome}{{view="{_rotulo(vista)}"}} {valor}')
+
+        linhas += [
+            '# HELP jogo_n_mais_1_total Repetições de cada consulta dentro do mesmo pedido.',
+            '# TYPE jogo_n_mais_1_total counter',
+        ]
+        for (vista, sql), n in sorted(assinaturas.items(), key=lambda item: -item[1]):
+            linhas.append(f'jogo_n_mais_1_total{{view="{_rotulo(vista)}",sql="{_rotulo(sql)}"}} {n}')
+        return '\n'.join(linhas) + '\n'
+
+
+def _rotulo(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+registo = Registo()
+
+
+class InstrumentacaoMiddleware:
+    """
+    Mede cada pedido. Fica desligado (MiddlewareNotUsed) sem INSTRUMENTACAO;
+    ligado, custa um perf_counter e um incremento por consulta. Suporta os
+    dois modos para não obrigar as views assíncronas a saltar de thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTACAO', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+        connection_created.connect(_instalar)
+        for connection in connections.all(initialized_only=True):
+            _instalar(connection=connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        consultas = ConsultasDoPedido()
+        token = _consultas_do_pedido.set(consultas)
+        inicio = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            _consultas_do_pedido.reset(token)
+            self.registar(request, time.perf_counter() - inicio, consultas)
+
+    async def __acall__(self, request):
+        consultas = ConsultasDoPedido()
+        token = _consultas_do_pedido.set(consultas)
+        inicio = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            _consultas_do_pedido.reset(token)
+            self.registar(request, time.perf_counter() - inicio, consultas)
+
+    def registar(self, request, latencia, consultas):
+        vista = getattr(request.resolver_match, 'view_name', None) or 'sem_rota'
+        registo.registar(vista, latencia, consultas)
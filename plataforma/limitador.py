@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Falhas de login permitidas por telefone dentro da janela
+MAX_TENTATIVAS = 5
+JANELA_SEGUNDOS = 300
+# Máximo de telefones guardados; acima disso esquece os que falharam há mais tempo
+MAX_CHAVES = 10000
+
+
+class LimitadorTentativas:
+    """
+    Janela deslizante em memória (por processo) das falhas de login de cada
+    telefone. Fica à frente do authenticate(): um telefone bloqueado não chega
+    a gastar CPU no hash da senha.
+    """
+
+    def __init__(self, maximo=MAX_TENTATIVAS, janela=JANELA_SEGUNDOS, max_chaves=MAX_CHAVES):
+        self.maximo = maximo
+        self.janela = janela
+        self.max_chaves = max_chaves
+        # Ordenado pela última falha: à frente ficam os telefones parados há mais tempo
+        self._falhas = OrderedDict()
+        self._trinco = threading.Lock()
+
+    def _recentes(self, chave, agora):
+        falhas = self._falhas.get(chave)
+        if falhas is None:
+            return None
+        while falhas and falhas[0] <= agora - self.janela:
+            falhas.popleft()
+        if not falhas:
+            del self._falhas[chave]
+            return None
+        return falhas
+
+    def bloqueado(self, chave):
+        with self._trinco:
+            falhas = self._recentes(chave, time.monotonic())
+            return falhas is not None and len(falhas) >= self.maximo
+
+    def registar_falha(self, chave):
+        agora = time.monotonic()
+        with self._trinco:
+            falhas = self._recentes(chave, agora)
+            if falhas is None:
+                falhas = self._falhas[chave] = deque(maxlen=self.maximo)
+            else:
+                self._falhas.move_to_end(chave)
+            falhas.append(agora)
+            # Só olha para a frente da fila: O(1) amortizado por falha, mesmo com
+            # milhares de telefones diferentes a falhar (ataque por pulverização)
+            while self._falhas:
+                antigas = next(iter(self._falhas.values()))
+                if len(self._falhas) <= self.max_chaves and antigas[-1] > agora - self.janela:
+                    break
+                self._falhas.popitem(last=False)
+
+    def limpar(self, chave):
+        with self._trinco:
+            self._falhas.pop(chave, None)
+
+
+tentativas_login = LimitadorTentativas()
@@ -0,0 +1,260 @@
+import logging
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .ciclo import DURACAO_CICLO, invalidar_rodada
+from .models import Aposta, Rodada, TotalApostas, Usuario
+
+logger = logging.getLogger(__name__)
+
+# Opções do dado e respetivo multiplicador (0 devolve o valor investido)
+OPCOES = [0, 2, 3, 4, 5, 6]
+
+
+# Resultado de cada jogador na cache, lido por processar_resultado_final sem ir à base de dados
+VALIDADE_RESULTADO = DURACAO_CICLO * 3
+
+
+def multiplicador(opcao):
+    return 1 if opcao == 0 else opcao
+
+
+def chave_resultado(rodada_id, usuario_id):
+    return f'resultado:{rodada_id}:{usuario_id}'
+
+
+def _resultado_jogador(numero_sorteado, premio, saldo):
+    return {
+        'status': 'liquidado',
+        'numero_sorteado': numero_sorteado,
+        'ganhou': premio > 0,
+        'premio': float(premio),
+        'novo_saldo': float(saldo),
+    }
+
+
+@dataclass
+class ResultadoLiquidacao:
+    rodada_id: int
+    numero_sorteado: int | None
+    apostas_vencedoras: int = 0
+    apostas_perdedoras: int = 0
+    usuarios_creditados: int = 0
+    tempo_ms: float = 0.0
+    # True quando os totais por opção vieram dos contadores em cache (sem varrer as apostas)
+    exposicao_em_cache: bool = False
+
+    @property
+    def linhas_afetadas(self):
+        return self.apostas_vencedoras + self.apostas_perdedoras + self.usuarios_creditados + 1
+
+
+def escolher_vencedor(totais_por_opcao):
+    """
+    Recebe {opcao: total_apostado} e devolve a opção que menos custa à casa.
+    Em caso de empate ganha a primeira opção de OPCOES.
+    """
+    gastos = {opt: (totais_por_opcao.get(opt) or 0) * multiplicador(opt) for opt in OPCOES}
+    return min(gastos, key=gastos.get)
+
+
+# --- Exposição da rodada em tempo real ---
+# Contadores na cache (inteiros em cêntimos, incr é atómico em LocMem e Redis):
+# total apostado por opção e número de apostas. Atualizados a cada aposta.
+VALIDADE_EXPOSICAO = DURACAO_CICLO * 3
+
+
+def _chave_exposicao(rodada_id, campo):
+    return f'exposicao:{rodada_id}:{campo}'
+
+
+def _incrementar(chave, delta):
+    try:
+        cache.incr(chave, delta)
+    except ValueError:
+        # Primeira aposta da rodada neste cache; add() não pisa um valor criado entretanto
+        cache.add(chave, 0, VALIDADE_EXPOSICAO)
+        cache.incr(chave, delta)
+
+
+def registrar_exposicao(rodada_id, apostas):
+    """
+    Soma as apostas [(opcao, valor), ...] aos contadores da rodada. Corre depois
+    do commit da aposta, que já está gravada e debitada: um erro da cache fica só
+    no log. Os contadores deixam de bater com TotalApostas e a liquidação usa a
+    consulta agrupada.
+    """
+    centavos = {}
+    for opcao, valor in apostas:
+        centavos[opcao] = centavos.get(opcao, 0) + int((Decimal(valor) * 100).to_integral_value())
+    try:
+        for opcao, delta in centavos.items():
+            _incrementar(_chave_exposicao(rodada_id, opcao), delta)
+        _incrementar(_chave_exposicao(rodada_id, 'n'), len(apostas))
+    except Exception:
+        logger.exception("Falha ao atualizar a exposição da rodada %s", rodada_id)
+
+
+def ler_exposicao(rodada_id):
+    """
+    Devolve (quantidade, {opcao: total}) dos contadores, numa só leitura da
+    cache, ou None se esta cache não os tiver (ex. cache local de outro processo).
+    """
+    chaves = {_chave_exposicao(rodada_id, campo): campo for campo in OPCOES + ['n']}
+    valores = cache.get_many(list(chaves))
+    quantidade = valores.pop(_chave_exposicao(rodada_id, 'n'), None)
+    if quantidade is None:
+        return None
+    totais = {chaves[chave]: Decimal(centavos) / 100 for chave, centavos in valores.items()}
+    return quantidade, totais
+
+
+def _contadores_conferidos(rodada_id):
+    """
+    Contadores da rodada só se baterem certo com TotalApostas (quantidade e
+    total investido), senão None. TotalApostas sobe na transação da própria
+    aposta; os contadores só depois do commit e podem faltar ou estar a meio.
+    """
+    contadores = ler_exposicao(rodada_id)
+    if contadores is None:
+        return None
+    quantidade, totais = contadores
+    gravado = TotalApostas.objects.filter(rodada_id=rodada_id).values_list(
+        'quantidade', 'total_investido').first()
+    if gravado != (quantidade, sum(totais.values(), Decimal(0))):
+        return None
+    return contadores
+
+
+def apostas_por_opcao(rodada_id):
+    """(opcao, n, total) das apostas da rodada numa consulta agrupada, pelo índice (rodada, opção)."""
+    return (Aposta.objects.filter(rodada_id=rodada_id).order_by()
+            .values_list('valor_escolhido').annotate(n=Count('id'), total=Sum('valor_investido')))
+
+
+def exposicao_da_rodada(rodada_id):
+    """
+    Totais por opção para o painel de exposição: contadores em cache se baterem
+    certo com TotalApostas e, senão, a consulta agrupada à base de dados.
+    Devolve (quantidade, totais, em_cache).
+    """
+    contadores = _contadores_conferidos(rodada_id)
+    if contadores is not None:
+        return contadores + (True,)
+    por_opcao = list(apostas_por_opcao(rodada_id))
+    return sum(n for _, n, _ in por_opcao), {opcao: total for opcao, _, total in por_opcao}, False
+
+
+def liquidar_rodada(rodada_id):
+    """
+    Fecha a rodada numa única transação:
+    totais por opção dos contadores de exposição (ou 1 consulta agrupada se não
+    baterem certo), 2 UPDATEs em massa para marcar
+    vencedores/perdedores, 1 UPDATE por utilizador vencedor, 1 INSERT
+    em lote no extrato e a atualização dos totais (TotalApostas).
+    Depois do commit publica na cache o resultado de cada jogador.
+    Se a rodada já estiver fechada não faz nada.
+    """
+    inicio = time.perf_counter()
+    with transaction.atomic():
+        rodada = Rodada.objects.select_for_update().get(id=rodada_id)
+        if not rodada.ativa:
+            return ResultadoLiquidacao(rodada_id, rodada.numero_sorteado)
+
+        apostas = Aposta.objects.filter(rodada_id=rodada_id)
+        # Os contadores só valem se baterem certo com o total gravado na base de dados;
+        # senão (outro processo, cache limpa, aposta a meio) volta à consulta agrupada.
+        # O bloqueio da rodada faz esperar as apostas em curso, por isso TotalApostas
+        # conta todas as apostas gravadas.
+        contadores = _contadores_conferidos(rodada_id)
+        em_cache = contadores is not None
+        if em_cache:
+            quantidade, totais = contadores
+        else:
+            por_opcao = list(apostas_por_opcao(rodada_id))
+            quantidade = sum(n for _, n, _ in por_opcao)
+            totais = {opcao: total for opcao, _, total in por_opcao}
+        numero_vencedor = escolher_vencedor(totais)
+
+        Rodada.objects.filter(id=rodada_id).update(numero_sorteado=numero_vencedor, ativa=False)
+
+        # Só liquida apostas ainda pendentes
+        pendentes = apostas.filter(ganhou__isnull=True)
+        vencedoras = pendentes.filter(valor_escolhido=numero_vencedor)
+        premios = list(
+            vencedoras.order_by().values_list('usuario_id').annotate(total=Sum('valor_investido'))
+        )
+        n_vencedoras = vencedoras.update(ganhou=True)
+        n_perdedoras = pendentes.update(ganhou=False)
+
+        fator = Decimal(multiplicador(numero_vencedor))
+        premios = {usuario_id: total * fator for usuario_id, total in premios}
+        Usuario.objects.creditar_em_lote(premios.items(), 'PREMIO', f'rodada:{rodada_id}')
+
+        total_vencedoras = totais.get(numero_vencedor) or Decimal(0)
+        TotalApostas.objects.fechar_rodada(
+            rodada_id, quantidade, sum(totais.values(), Decimal(0)),
+            total_vencedoras, total_vencedoras * fator,
+        )
+
+    if rodada.ciclo is not None:
+        invalidar_rodada(rodada.ciclo)
+    publicar_resultados(rodada_id, numero_vencedor, premios)
+
+    resultado = ResultadoLiquidacao(
+        rodada_id=rodada_id,
+        numero_sorteado=numero_vencedor,
+        apostas_vencedoras=n_vencedoras,
+        apostas_perdedoras=n_perdedoras,
+        usuarios_creditados=len(premios),
+        tempo_ms=(time.perf_counter() - inicio) * 1000,
+        exposicao_em_cache=em_cache,
+    )
+    logger.info(
+        "Rodada %s liquidada: numero=%s linhas=%s tempo=%.1fms contadores=%s",
+        rodada_id, numero_vencedor, resultado.linhas_afetadas, resultado.tempo_ms, em_cache,
+    )
+    return resultado
+
+
+def publicar_resultados(rodada_id, numero_sorteado, premios):
+    """
+    Guarda na cache o resultado de todos os jogadores da rodada: 1 SELECT dos
+    saldos já creditados + 1 set_many. `premios` é {usuario_id: premio}.
+    """
+    saldos = (Usuario.objects.filter(aposta__rodada_id=rodada_id).distinct()
+              .values_list('id', 'saldo'))
+    cache.set_many({
+        chave_resultado(rodada_id, usuario_id): _resultado_jogador(
+            numero_sorteado, premios.get(usuario_id, 0), saldo)
+        for usuario_id, saldo in saldos
+    }, VALIDADE_RESULTADO)
+
+
+async def aobter_resultado(rodada_id, usuario):
+    """
+    Resultado do jogador numa rodada, só com leituras: primeiro a cache; se
+    faltar (outro processo com cache local, ou expirou) recalcula a partir da
+    rodada já liquidada. Devolve None enquanto a rodada não estiver liquidada.
+    """
+    chave = chave_resultado(rodada_id, usuario.id)
+    resultado = await cache.aget(chave)
+    if resultado is not None:
+        return resultado
+
+    numero_sorteado = await (Rodada.objects.filter(id=rodada_id, ativa=False)
+                             .values_list('numero_sorteado', flat=True).afirst())
+    if numero_sorteado is None:
+        return None
+    investido = (await Aposta.objects.filter(
+        rodada_id=rodada_id, usuario=usuario, valor_escolhido=numero_sorteado,
+    ).aaggregate(total=Sum('valor_investido')))['total'] or 0
+    resultado = _resultado_jogador(
+        numero_sorteado, investido * Decimal(multiplicador(numero_sorteado)), usuario.saldo)
+    await cache.aset(chave, resultado, VALIDADE_RESULTADO)
+    return resultado
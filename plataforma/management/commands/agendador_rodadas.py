@@ -0,0 +1,111 @@
+import logging
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from plataforma.ciclo import (
+    DURACAO_CICLO, FIM_APOSTAS, ciclo_atual, inicio_do_ciclo, rodada_do_ciclo,
+)
+from plataforma.liquidacao import liquidar_rodada
+from plataforma.models import Rodada
+
+logger = logging.getLogger(__name__)
+
+CHAVE_METRICAS = 'agendador:metricas'
+
+
+class Command(BaseCommand):
+    help = (
+        "Abre uma rodada no início de cada ciclo de 40s, fecha as apostas no "
+        "segundo 30 e liquida a rodada antes do ciclo seguinte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ciclos', type=int, default=0,
+                            help="Número de ciclos a executar (0 = sem fim).")
+
+    def handle(self, *args, **options):
+        self.metricas = {
+            'ciclos': 0,
+            'deriva_abertura_ms': 0.0,
+            'deriva_fecho_ms': 0.0,
+            'atraso_liquidacao_ms': 0.0,
+            'max_atraso_liquidacao_ms': 0.0,
+            'ultima_rodada': None,
+        }
+        if isinstance(caches['default'], LocMemCache):
+            logger.warning("Cache local a este processo (sem REDIS_URL): os processos web "
+                           "não veem os resultados nem as métricas do agendador")
+        self.recuperar_rodadas_pendentes()
+
+        executados = 0
+        ciclo = ciclo_atual()
+        falhou = None
+        while not options['ciclos'] or executados < options['ciclos']:
+            try:
+                self.executar_ciclo(ciclo)
+            except Exception:
+                # Um erro (ex.: base de dados em baixo) não pára o worker: a rodada
+                # deste ciclo fica aberta e é liquidada quando o ciclo já tiver passado
+                logger.exception("Falha no ciclo %s", ciclo)
+                falhou = ciclo
+            executados += 1
+            # Se a liquidação atrasou mais do que um ciclo, salta para o ciclo corrente
+            # e liquida as rodadas dos ciclos saltados (abertas pelos servidores web)
+            proximo, atual = ciclo + 1, ciclo_atual()
+            if atual > proximo:
+                logger.warning("Saltados %s ciclos; a liquidar rodadas pendentes", atual - proximo)
+            if atual > proximo or (falhou is not None and atual > falhou):
+                try:
+                    self.recuperar_rodadas_pendentes()
+                    falhou = None
+                except Exception:
+                    logger.exception("Falha ao liquidar rodadas pendentes")
+            ciclo = max(proximo, atual)
+
+    def recuperar_rodadas_pendentes(self):
+        """Liquida rodadas de ciclos anteriores que ficaram abertas (ex.: reinício do worker)."""
+        pendentes = (Rodada.objects.filter(ativa=True)
+                     .exclude(ciclo=ciclo_atual())
+                     .values_list('id', flat=True))
+        for rodada_id in pendentes:
+            liquidar_rodada(rodada_id)
+
+    def executar_ciclo(self, ciclo):
+        inicio = inicio_do_ciclo(ciclo)
+        close_old_connections()
+
+        # 1. Abertura (segundo 0). Se o worker arrancar a meio do ciclo abre de imediato.
+        self.esperar_ate(inicio)
+        rodada = rodada_do_ciclo(ciclo)
+        self.metricas['deriva_abertura_ms'] = (time.time() - inicio) * 1000
+
+        # 2. Fecho das apostas (segundo 30) e liquidação
+        fecho = inicio + FIM_APOSTAS
+        self.esperar_ate(fecho)
+        self.metricas['deriva_fecho_ms'] = (time.time() - fecho) * 1000
+        resultado = liquidar_rodada(rodada.id)
+        atraso = (time.time() - fecho) * 1000
+
+        self.metricas['ciclos'] += 1
+        self.metricas['atraso_liquidacao_ms'] = atraso
+        self.metricas['max_atraso_liquidacao_ms'] = max(self.metricas['max_atraso_liquidacao_ms'], atraso)
+        self.metricas['ultima_rodada'] = rodada.id
+        cache.set(CHAVE_METRICAS, self.metricas, DURACAO_CICLO * 3)
+
+        if atraso > (DURACAO_CICLO - FIM_APOSTAS) * 1000:
+            logger.warning("Rodada %s liquidada depois do fim do ciclo (%.0fms)", rodada.id, atraso)
+        logger.info(
+            "Ciclo %s: rodada=%s numero=%s deriva_abertura=%.1fms deriva_fecho=%.1fms atraso_liquidacao=%.1fms",
+            ciclo, rodada.id, resultado.numero_sorteado, self.metricas['deriva_abertura_ms'],
+            self.metricas['deriva_fecho_ms'], atraso,
+        )
+
+    @staticmethod
+    def esperar_ate(instante):
+        restante = instante - time.time()
+        if restante > 0:
+            time.sleep(restante)
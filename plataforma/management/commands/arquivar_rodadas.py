@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from plataforma.arquivo import ResultadoArquivo, arquivar_lote, corte_em_dias
+
+
+class Command(BaseCommand):
+    help = (
+        "Arquiva as rodadas liquidadas há mais de --dias dias: as apostas passam a "
+        "resumos diários por jogador e as linhas originais são apagadas, em lotes "
+        "curtos. Pode ser interrompido e executado de novo sem perder nada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30,
+                            help="Mantém as rodadas dos últimos N dias (dias completos).")
+        parser.add_argument('--lote', type=int, default=100,
+                            help="Rodadas por transação.")
+        parser.add_argument('--pausa', type=float, default=0.5,
+                            help="Segundos entre lotes, para não competir com o jogo.")
+        parser.add_argument('--max-lotes', type=int, default=0,
+                            help="Para ao fim de N lotes (0 = até ao fim).")
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1 or options['lote'] < 1:
+            raise CommandError("--dias e --lote têm de ser pelo menos 1.")
+
+        corte = corte_em_dias(options['dias'])
+        self.stdout.write(f"A arquivar rodadas anteriores a {corte:%d/%m/%Y %H:%M}")
+        total, lotes = ResultadoArquivo(), 0
+        inicio = time.perf_counter()
+        while not options['max_lotes'] or lotes < options['max_lotes']:
+            close_old_connections()
+            resultado = arquivar_lote(corte, options['lote'])
+            if resultado is None:
+                break
+            lotes += 1
+            total.rodadas += resultado.rodadas
+            total.apostas += resultado.apostas
+            total.resumos += resultado.resumos
+            self.stdout.write(
+                f"Lote {lotes}: {resultado.rodadas} rodadas, {resultado.apostas} apostas "
+                f"-> {resultado.resumos} resumos"
+            )
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total.rodadas} rodadas e {total.apostas} apostas arquivadas em {lotes} lotes "
+            f"({time.perf_counter() - inicio:.1f}s)"
+        ))
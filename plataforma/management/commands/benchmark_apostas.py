@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from plataforma.benchmark import (
+    Medicao, banco_de_teste, criar_jogadores, dados_aposta, fase_de_apostas,
+    latencia_simulada,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara quantas apostas por segundo um processo aguenta como worker "
+        "síncrono (um pedido de cada vez) e como worker ASGI (pedidos concorrentes)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apostas', type=int, default=200,
+                            help="Total de apostas enviadas em cada modo.")
+        parser.add_argument('--concorrencia', type=int, default=50,
+                            help="Jogadores a apostar ao mesmo tempo no modo ASGI.")
+        parser.add_argument('--latencia-ms', type=float, default=5,
+                            help="Atraso simulado por consulta (rede até à base de dados).")
+
+    def handle(self, *args, **options):
+        total = options['apostas']
+        concorrencia = options['concorrencia']
+        self.url = reverse('fazer_aposta')
+
+        with banco_de_teste(), fase_de_apostas(), latencia_simulada(options['latencia_ms']):
+            jogadores = criar_jogadores(concorrencia)
+            sincrono = self.modo_sincrono(jogadores, total)
+            # Com o WhiteNoiseMiddleware (só síncrono) a cadeia inteira corre numa thread;
+            # core.asgi tira-o do MIDDLEWARE (SERVIDOR_ASGI), como no modo 'asgi'
+            com_whitenoise = asyncio.run(self.modo_assincrono(jogadores, total, concorrencia))
+            sem_whitenoise = [m for m in settings.MIDDLEWARE if not m.startswith('whitenoise.')]
+            with override_settings(MIDDLEWARE=sem_whitenoise):
+                assincrono = asyncio.run(self.modo_assincrono(jogadores, total, concorrencia))
+
+        self.stdout.write(f"{'modo':<16}{'apostas/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'erros':>8}")
+        for nome, resultado in (('sincrono', sincrono), ('asgi+whitenoise', com_whitenoise),
+                                ('asgi', assincrono)):
+            self.stdout.write(
+                f"{nome:<16}{resultado['por_segundo']:>12.1f}{resultado['p50_ms']:>10.1f}"
+                f"{resultado['p99_ms']:>10.1f}{resultado['erros']:>8}"
+            )
+        if sincrono['por_segundo']:
+            ganho = assincrono['por_segundo'] / sincrono['por_segundo']
+            self.stdout.write(self.style.SUCCESS(f"Apostas por processo: {ganho:.1f}x com ASGI"))
+
+    def modo_sincrono(self, jogadores, total):
+        """Um worker gunicorn síncrono: cada aposta espera que a anterior termine."""
+        clientes = []
+        for jogador in jogadores:
+            cliente = Client()
+            cliente.force_login(jogador)
+            clientes.append(cliente)
+
+        medicao = Medicao()
+        inicio = time.perf_counter()
+        for i in range(total):
+            medicao.medir(lambda: clientes[i % len(clientes)].post(self.url, dados_aposta(i)))
+        return medicao.resumo(time.perf_counter() - inicio)
+
+    async def modo_assincrono(self, jogadores, total, concorrencia):
+        """Um worker ASGI: até `concorrencia` apostas em curso no mesmo processo."""
+        clientes = []
+        for jogador in jogadores:
+            cliente = AsyncClient()
+            await cliente.aforce_login(jogador)
+            clientes.append(cliente)
+
+        medicao = Medicao()
+        limite = asyncio.Semaphore(concorrencia)
+
+        async def apostar(i):
+            async with limite:
+                # Como o ASGIHandler: cada pedido tem a sua thread para o código síncrono
+                async with ThreadSensitiveContext():
+                    t0 = time.perf_counter()
+                    resposta = await clientes[i % len(clientes)].post(self.url, dados_aposta(i))
+                    medicao.registar(time.perf_counter() - t0, resposta.status_code == 200)
+                    await sync_to_async(connections.close_all)()
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(apostar(i) for i in range(total)))
+        return medicao.resumo(time.perf_counter() - inicio)
@@ -0,0 +1,176 @@
+import json
+import platform
+import random
+import time
+from decimal import Decimal
+
+import django
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from plataforma.benchmark import (
+    Medicao, banco_de_teste, dados_aposta, em_paralelo, fase_de_apostas, latencia_simulada,
+)
+from plataforma.ciclo import FIM_APOSTAS
+from plataforma.liquidacao import OPCOES
+from plataforma.models import Aposta, Deposito, Rodada, Usuario
+from plataforma.views import fechar_rodada_lucrativa
+
+# GIF 1x1 válido, para o comprovativo do depósito
+COMPROVATIVO = (
+    b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00'
+    b'\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Simula um ciclo completo do jogo com N jogadores em simultâneo (cadastro, "
+        "depósito, apostas na janela de 30s e liquidação) numa base de dados de "
+        "teste, e grava as medições num ficheiro JSON para comparar execuções."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jogadores', type=int, default=50,
+                            help="Jogadores em simultâneo (uma thread por jogador).")
+        parser.add_argument('--apostas', type=int, default=5,
+                            help="Apostas de cada jogador durante a janela.")
+        parser.add_argument('--tamanhos', default='100,1000,5000',
+                            help="Tamanhos de rodada (apostas) para medir a liquidação.")
+        parser.add_argument('--latencia-ms', type=float, default=0,
+                            help="Atraso simulado por consulta (rede até à base de dados).")
+        parser.add_argument('--saida', default='benchmark_ciclo.json',
+                            help="Ficheiro JSON com os resultados.")
+
+    def handle(self, *args, **options):
+        self.n_jogadores = options['jogadores']
+        self.n_apostas = options['apostas']
+        tamanhos = [int(t) for t in options['tamanhos'].split(',') if t.strip()]
+
+        resultados = {
+            'data': timezone.now().isoformat(),
+            'base_de_dados': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'parametros': {
+                'jogadores': self.n_jogadores, 'apostas_por_jogador': self.n_apostas,
+                'latencia_ms': options['latencia_ms'], 'tamanhos': tamanhos,
+            },
+        }
+        with banco_de_teste(), fase_de_apostas(), latencia_simulada(options['latencia_ms']):
+            self.clientes = [Client() for _ in range(self.n_jogadores)]
+            resultados['cadastro'] = self.fase_cadastro()
+            resultados['deposito'] = self.fase_deposito()
+            resultados['apostas'] = self.fase_apostas()
+            resultados['consultas_por_pedido'] = self.consultas_por_pedido()
+            resultados['liquidacao'] = [self.medir_liquidacao(tamanho) for tamanho in tamanhos]
+
+        with open(options['saida'], 'w') as ficheiro:
+            json.dump(resultados, ficheiro, indent=2)
+        self.mostrar(resultados)
+        self.stdout.write(self.style.SUCCESS(f"Resultados gravados em {options['saida']}"))
+
+    # --- Fases do ciclo ---
+
+    def fase_cadastro(self):
+        medicao = Medicao()
+        url = reverse('cadastro')
+
+        def cadastrar(i):
+            medicao.medir(lambda: self.clientes[i].post(url, {
+                'telefone': f'95{i:07d}', 'password': 'benchmark', 'pais': 'Angola',
+            }), sucesso=(302,))
+
+        return medicao.resumo(em_paralelo(cadastrar, range(self.n_jogadores), self.n_jogadores))
+
+    def fase_deposito(self):
+        medicao = Medicao()
+        url = reverse('depositar')
+
+        def depositar(i):
+            comprovativo = SimpleUploadedFile('comprovativo.gif', COMPROVATIVO, 'image/gif')
+            medicao.medir(lambda: self.clientes[i].post(url, {
+                'metodo': 'BANCO', 'valor': '50000', 'nome_depositante': f'Jogador {i}',
+                'comprovativo': comprovativo,
+            }), sucesso=(302,))
+
+        resumo = medicao.resumo(em_paralelo(depositar, range(self.n_jogadores), self.n_jogadores))
+        # Aprovação em lote, como no admin
+        inicio = time.perf_counter()
+        with CaptureQueriesContext(connection) as consultas:
+            aprovados = Deposito.objects.filter(status='PENDENTE').aprovar()
+        resumo['aprovacao'] = {
+            'depositos': aprovados,
+            'tempo_ms': round((time.perf_counter() - inicio) * 1000, 1),
+            'consultas': len(consultas),
+        }
+        return resumo
+
+    def fase_apostas(self):
+        medicao = Medicao()
+        url = reverse('fazer_aposta')
+
+        def apostar(i):
+            for j in range(self.n_apostas):
+                medicao.medir(lambda: self.clientes[i].post(url, dados_aposta(i + j)))
+
+        resumo = medicao.resumo(em_paralelo(apostar, range(self.n_jogadores), self.n_jogadores))
+        resumo['dentro_da_janela'] = resumo['duracao_s'] <= FIM_APOSTAS
+        return resumo
+
+    def consultas_por_pedido(self):
+        """Número de consultas SQL de cada pedido do ciclo, medido num pedido isolado."""
+        cliente = self.clientes[0]
+        rodada = Rodada.objects.filter(ativa=True).latest('id')
+        pedidos = {
+            'jogo': lambda: cliente.get(reverse('home_jogo')),
+            'apostar': lambda: cliente.post(reverse('fazer_aposta'), dados_aposta(0)),
+            'resultado': lambda: cliente.get(reverse('processar_resultado'), {'rodada_id': rodada.id}),
+            'historico': lambda: cliente.get(reverse('historico')),
+        }
+        contagem = {}
+        for nome, pedido in pedidos.items():
+            with CaptureQueriesContext(connection) as consultas:
+                pedido()
+            contagem[nome] = len(consultas)
+        return contagem
+
+    def medir_liquidacao(self, tamanho):
+        """Cria uma rodada com `tamanho` apostas e mede fechar_rodada_lucrativa()."""
+        jogadores = list(Usuario.objects.values_list('id', flat=True))
+        rodada = Rodada.objects.create(ativa=True)
+        sorteio = random.Random(tamanho)
+        Aposta.objects.bulk_create([
+            Aposta(usuario_id=sorteio.choice(jogadores), rodada=rodada,
+                   valor_escolhido=sorteio.choice(OPCOES),
+                   valor_investido=Decimal(sorteio.randrange(100, 10000, 100)))
+            for _ in range(tamanho)
+        ], batch_size=1000)
+
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = fechar_rodada_lucrativa(rodada.id)
+        return {
+            'apostas': tamanho,
+            'tempo_ms': round(resultado.tempo_ms, 1),
+            'consultas': len(consultas),
+            'linhas_afetadas': resultado.linhas_afetadas,
+        }
+
+    def mostrar(self, resultados):
+        for fase in ('cadastro', 'deposito', 'apostas'):
+            r = resultados[fase]
+            self.stdout.write(
+                f"{fase:<10} {r['pedidos']:>6} pedidos {r['por_segundo']:>8.1f}/s "
+                f"p50 {r['p50_ms']:>7.1f}ms p99 {r['p99_ms']:>7.1f}ms erros {r['erros']}"
+            )
+        self.stdout.write(f"consultas por pedido: {resultados['consultas_por_pedido']}")
+        for r in resultados['liquidacao']:
+            self.stdout.write(
+                f"liquidacao {r['apostas']:>6} apostas {r['tempo_ms']:>8.1f}ms "
+                f"{r['consultas']:>4} consultas"
+            )
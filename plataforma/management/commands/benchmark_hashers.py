@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o custo de cada hasher de senha (cadastro = encode, login = verify) "
+        "nesta máquina, para escolher HASH_SENHAS e afinar os custos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=5,
+                            help="Hashes medidos por hasher.")
+
+    def handle(self, *args, **options):
+        repeticoes = options['repeticoes']
+        candidatos = [('django (pbkdf2 1M)', PBKDF2PasswordHasher())] + [
+            (nome, import_string(caminho)()) for nome, caminho in settings.HASHERS_SENHAS.items()
+        ]
+
+        self.stdout.write(f"Em uso: {settings.HASH_SENHAS}")
+        self.stdout.write(f"{'hasher':<20}{'cadastro ms':>14}{'login ms':>12}{'logins/s/núcleo':>18}")
+        for nome, hasher in candidatos:
+            if hasher.library:
+                try:
+                    hasher._load_library()
+                except ValueError:
+                    self.stdout.write(f"{nome:<20}{'biblioteca em falta':>44}")
+                    continue
+
+            inicio = time.perf_counter()
+            for _ in range(repeticoes):
+                codificada = hasher.encode('senha-de-teste', hasher.salt())
+            cadastro = (time.perf_counter() - inicio) / repeticoes
+
+            inicio = time.perf_counter()
+            for _ in range(repeticoes):
+                hasher.verify('senha-de-teste', codificada)
+            login = (time.perf_counter() - inicio) / repeticoes
+
+            self.stdout.write(
+                f"{nome:<20}{cadastro * 1000:>14.1f}{login * 1000:>12.1f}{1 / login:>18.1f}"
+            )
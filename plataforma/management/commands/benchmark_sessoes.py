@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from plataforma.benchmark import banco_de_teste, criar_jogadores, latencia_simulada
+from plataforma.models import Rodada
+
+MODOS = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara os modos de sessão (SESSION_MODO) no login de todos os jogadores "
+        "(escrita da sessão) e nos pedidos de sondagem do jogo: consultas por pedido, "
+        "quantas tocam na tabela de sessões e latência."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=200,
+                            help="Pedidos medidos por modo e por endpoint.")
+        parser.add_argument('--latencia-ms', type=float, default=1,
+                            help="Atraso simulado por consulta (rede até à base de dados).")
+        parser.add_argument('--jogadores', type=int, default=1000,
+                            help="Sessões ativas ao mesmo tempo (acima do limite da cache há despejos).")
+
+    def handle(self, *args, **options):
+        with banco_de_teste(), latencia_simulada(options['latencia_ms']):
+            jogadores = criar_jogadores(options['jogadores'])
+            rodada = Rodada.objects.create(ativa=True)
+            pedidos = {
+                'resultado': lambda cliente: cliente.get(reverse('processar_resultado'), {'rodada_id': rodada.id}),
+                'jogo': lambda cliente: cliente.get(reverse('home_jogo')),
+            }
+
+            self.stdout.write(f"{'modo':<16}{'endpoint':<12}{'consultas':>10}{'sessão':>8}{'ms/pedido':>11}")
+            for modo, engine in MODOS.items():
+                with override_settings(SESSION_ENGINE=engine):
+                    # Escrita: uma sessão nova por jogador, com as dos jogadores anteriores já na cache
+                    clientes = [Client() for _ in jogadores]
+                    with CaptureQueriesContext(connection) as consultas:
+                        inicio = time.perf_counter()
+                        for cliente, jogador in zip(clientes, jogadores):
+                            cliente.force_login(jogador)
+                        duracao = time.perf_counter() - inicio
+                    self.linha(modo, 'login', consultas, duracao, len(jogadores))
+
+                    for nome, pedido in pedidos.items():
+                        for cliente in clientes:
+                            pedido(cliente)  # aquece a cache de sessões
+                        with CaptureQueriesContext(connection) as consultas:
+                            inicio = time.perf_counter()
+                            for i in range(options['pedidos']):
+                                pedido(clientes[i % len(clientes)])
+                            duracao = time.perf_counter() - inicio
+                        self.linha(modo, nome, consultas, duracao, options['pedidos'])
+
+    def linha(self, modo, nome, consultas, duracao, pedidos):
+        sessao = sum('django_session' in q['sql'] for q in consultas)
+        self.stdout.write(
+            f"{modo:<16}{nome:<12}{len(consultas) / pedidos:>10.1f}"
+            f"{sessao / pedidos:>8.1f}{duracao / pedidos * 1000:>11.2f}"
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from plataforma.comprovativos import processar_comprovativo
+from plataforma.models import Deposito
+
+
+class Command(BaseCommand):
+    help = (
+        "Comprime, gera a miniatura e deduplica os comprovativos enviados antes "
+        "do processamento em segundo plano (depósitos ainda sem hash)."
+    )
+
+    def handle(self, *args, **options):
+        pendentes = Deposito.objects.filter(hash_comprovativo='').exclude(comprovativo='')
+        total = 0
+        for deposito_id in pendentes.values_list('id', flat=True).iterator():
+            processar_comprovativo(deposito_id)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f"{total} comprovativos processados."))
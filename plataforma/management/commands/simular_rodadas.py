@@ -0,0 +1,132 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Sum
+
+from plataforma.configuracao import obter_configuracao
+from plataforma.liquidacao import OPCOES, multiplicador
+from plataforma.models import Aposta
+
+# Rodadas geradas de cada vez, para a memória não depender de --rodadas
+BLOCO = 100_000
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulação Monte Carlo (NumPy) da regra de liquidação: em cada rodada ganha "
+        "a opção que menos custa à casa, com os multiplicadores do jogo. Reporta a "
+        "taxa de pagamento, a variância e o risco de cauda da margem da casa. "
+        "Requer numpy (não faz parte das dependências do site)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rodadas', type=int, default=1_000_000,
+                            help="Número de rodadas simuladas.")
+        parser.add_argument('--fonte', choices=('sintetico', 'historico'), default='sintetico',
+                            help="historico: reamostra rodadas reais; sintetico: gera apostas "
+                                 "com as frequências históricas (ou uniformes sem histórico).")
+        parser.add_argument('--apostas-por-rodada', type=float, default=None,
+                            help="Média de apostas por rodada no modo sintético (omissão: histórico ou 20).")
+        parser.add_argument('--opcoes', default=','.join(str(o) for o in OPCOES),
+                            help="Opções do dado a testar (multiplicador = opção, 0 devolve o valor).")
+        parser.add_argument('--cauda', type=float, default=1.0,
+                            help="Percentil da cauda para VaR/CVaR da margem (em %%).")
+        parser.add_argument('--semente', type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+        except ImportError:
+            raise CommandError("Este comando precisa do NumPy: pip install numpy")
+
+        self.np = np
+        self.rng = np.random.default_rng(options['semente'])
+        try:
+            opcoes = [int(o) for o in options['opcoes'].split(',')]
+        except ValueError:
+            raise CommandError("--opcoes deve ser uma lista de inteiros, ex. 0,2,3,4,5,6")
+        multiplicadores = np.array([multiplicador(o) for o in opcoes], dtype=float)
+
+        inicio = time.perf_counter()
+        if options['fonte'] == 'historico':
+            gerar = self.gerador_historico(opcoes)
+        else:
+            gerar = self.gerador_sintetico(opcoes, options['apostas_por_rodada'])
+
+        margens, apostado, pago = [], 0.0, 0.0
+        restantes = options['rodadas']
+        while restantes > 0:
+            m = min(BLOCO, restantes)
+            totais = gerar(m)
+            custos = totais * multiplicadores
+            # argmin devolve o primeiro mínimo: o mesmo desempate que escolher_vencedor()
+            vencedor = custos.argmin(axis=1)
+            premios = custos[np.arange(m), vencedor]
+            entradas = totais.sum(axis=1)
+            apostado += entradas.sum()
+            pago += premios.sum()
+            margens.append(entradas - premios)
+            restantes -= m
+        margens = np.concatenate(margens)
+        duracao = time.perf_counter() - inicio
+
+        cauda = np.sort(margens)[:max(1, int(len(margens) * options['cauda'] / 100))]
+        self.stdout.write(f"Rodadas simuladas: {len(margens):,} em {duracao:.2f}s ({options['fonte']})")
+        self.stdout.write(f"Opções: {opcoes}  multiplicadores: {multiplicadores.astype(int).tolist()}")
+        self.stdout.write(f"Total apostado: {apostado:,.0f} Kz  total pago: {pago:,.0f} Kz")
+        self.stdout.write(f"Taxa de pagamento: {pago / apostado:.4f}" if apostado else "Taxa de pagamento: -")
+        self.stdout.write(f"Margem por rodada: média {margens.mean():,.1f} Kz  "
+                          f"desvio padrão {margens.std():,.1f}  variância {margens.var():,.1f}")
+        self.stdout.write(f"Rodadas com perda para a casa: {(margens < 0).mean():.4%}")
+        self.stdout.write(f"VaR {options['cauda']:g}%: {cauda[-1]:,.1f} Kz  "
+                          f"CVaR {options['cauda']:g}%: {cauda.mean():,.1f} Kz")
+
+    # --- Geradores: devolvem uma matriz (rodadas x opções) com o total apostado ---
+
+    def gerador_historico(self, opcoes):
+        """Reamostra (com reposição) as rodadas reais, já agregadas por opção."""
+        np = self.np
+        linhas = (Aposta.objects.filter(valor_escolhido__in=opcoes).order_by()
+                  .values_list('rodada_id', 'valor_escolhido').annotate(total=Sum('valor_investido')))
+        rodadas, coluna = {}, {opcao: i for i, opcao in enumerate(opcoes)}
+        for rodada_id, opcao, total in linhas:
+            rodadas.setdefault(rodada_id, np.zeros(len(opcoes)))[coluna[opcao]] = float(total)
+        if not rodadas:
+            raise CommandError("Não há apostas históricas; use --fonte sintetico.")
+        historico = np.stack(list(rodadas.values()))
+        self.stdout.write(f"Histórico: {len(historico):,} rodadas")
+        return lambda m: historico[self.rng.integers(0, len(historico), size=m)]
+
+    def gerador_sintetico(self, opcoes, media_apostas):
+        """
+        Número de apostas por opção ~ Poisson (frequências históricas de cada
+        opção) e valores tirados dos valores apostados no histórico, ou dos
+        valores pré-definidos da configuração se ainda não houver apostas.
+        """
+        np = self.np
+        por_opcao = dict(Aposta.objects.filter(valor_escolhido__in=opcoes).order_by()
+                         .values_list('valor_escolhido').annotate(n=Count('id')))
+        n_rodadas = Aposta.objects.values('rodada_id').distinct().count()
+        n_apostas = sum(por_opcao.values())
+
+        if n_apostas:
+            frequencias = np.array([por_opcao.get(o, 0) for o in opcoes], dtype=float) / n_apostas
+            valores = np.fromiter(
+                Aposta.objects.filter(valor_escolhido__in=opcoes).values_list('valor_investido', flat=True)
+                .iterator(chunk_size=10_000), dtype=float)
+        else:
+            frequencias = np.full(len(opcoes), 1 / len(opcoes))
+            valores = np.array(obter_configuracao().valores_pre or [1000], dtype=float)
+        if media_apostas is None:
+            media_apostas = n_apostas / n_rodadas if n_rodadas else 20
+
+        medias = media_apostas * frequencias
+
+        def gerar(m):
+            contagens = self.rng.poisson(medias, size=(m, len(opcoes)))
+            # Soma de `contagem` valores sorteados em cada célula, sem ciclos em Python
+            celula = np.repeat(np.arange(m * len(opcoes)), contagens.ravel())
+            montantes = self.rng.choice(valores, size=len(celula))
+            return np.bincount(celula, weights=montantes, minlength=m * len(opcoes)).reshape(m, len(opcoes))
+
+        return gerar
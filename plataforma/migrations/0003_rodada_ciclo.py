@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plataforma', '0002_metodobanco_metodoexpress_metodoreferencia_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rodada',
+            name='ciclo',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+    ]
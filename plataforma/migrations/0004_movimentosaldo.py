@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plataforma', '0003_rodada_ciclo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimentoSaldo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('APOSTA', 'Aposta'), ('PREMIO', 'Prémio'), ('DEPOSITO', 'Depósito'), ('COMISSAO', 'Comissão'), ('SAQUE', 'Saque')], max_length=20)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('saldo_apos', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('referencia', models.CharField(blank=True, max_length=50)),
+                ('data', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimentos', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plataforma', '0004_movimentosaldo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aposta',
+            index=models.Index(fields=['rodada', 'valor_escolhido'], name='aposta_rodada_opcao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aposta',
+            index=models.Index(fields=['usuario', '-id'], name='aposta_usuario_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deposito',
+            index=models.Index(fields=['usuario', '-data_criacao'], name='deposito_usuario_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deposito',
+            index=models.Index(fields=['status'], name='deposito_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rodada',
+            index=models.Index(condition=models.Q(('ativa', True)), fields=['ativa'], name='rodada_ativa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saque',
+            index=models.Index(fields=['usuario', '-data_pedido'], name='saque_usuario_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saque',
+            index=models.Index(fields=['status'], name='saque_status_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:45
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def preencher_estatisticas(apps, schema_editor):
+    Usuario = apps.get_model('plataforma', 'Usuario')
+    Deposito = apps.get_model('plataforma', 'Deposito')
+
+    totais = (Usuario.objects.filter(convidado_por__isnull=False).order_by()
+              .values_list('convidado_por').annotate(n=Count('id')))
+    for padrinho_id, n in totais:
+        Usuario.objects.filter(id=padrinho_id).update(total_subordinados=n)
+
+    aprovados = (Deposito.objects.filter(status='APROVADO', usuario__convidado_por__isnull=False).order_by()
+                 .values_list('usuario__convidado_por')
+                 .annotate(ativos=Count('usuario', distinct=True), total=Sum('valor')))
+    for padrinho_id, ativos, total in aprovados:
+        Usuario.objects.filter(id=padrinho_id).update(
+            subordinados_ativos=ativos,
+            comissao_total=(total * Decimal('0.15')).quantize(Decimal('0.01')),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plataforma', '0005_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='comissao_total',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='subordinados_ativos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='total_subordinados',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(preencher_estatisticas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def preencher_totais(apps, schema_editor):
+    Aposta = apps.get_model('plataforma', 'Aposta')
+    Rodada = apps.get_model('plataforma', 'Rodada')
+    TotalApostas = apps.get_model('plataforma', 'TotalApostas')
+
+    rodadas = {r_id: (numero, ativa) for r_id, numero, ativa in
+               Rodada.objects.values_list('id', 'numero_sorteado', 'ativa')}
+    por_rodada = (Aposta.objects.order_by().values_list('rodada_id')
+                  .annotate(n=Count('id'), total=Sum('valor_investido'),
+                            vencedoras=Sum('valor_investido', filter=Q(ganhou=True)),
+                            perdedoras=Sum('valor_investido', filter=Q(ganhou=False))))
+    linhas = []
+    acumulado = TotalApostas(rodada=None)
+    for rodada_id, n, total, vencedoras, perdedoras in por_rodada:
+        numero, ativa = rodadas[rodada_id]
+        numero = numero or 0
+        linha = TotalApostas(
+            rodada_id=rodada_id, quantidade=n, total_investido=total,
+            total_vencedoras=vencedoras or 0, total_perdedoras=perdedoras or 0,
+            total_pago=(vencedoras or 0) * (1 if numero == 0 else numero),
+        )
+        linhas.append(linha)
+        # O acumulado só inclui rodadas já fechadas; as ativas somam-se à parte
+        if not ativa:
+            for campo in ('quantidade', 'total_investido', 'total_vencedoras', 'total_perdedoras', 'total_pago'):
+                setattr(acumulado, campo, getattr(acumulado, campo) + getattr(linha, campo))
+    TotalApostas.objects.bulk_create(linhas + [acumulado], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plataforma', '0006_estatisticas_convite'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TotalApostas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.PositiveIntegerField(default=0)),
+                ('total_investido', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('total_vencedoras', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('total_perdedoras', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('total_pago', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('rodada', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='totais', to='plataforma.rodada')),
+            ],
+            options={
+                'verbose_name_plural': 'totais de apostas',
+            },
+        ),
+        migrations.RunPython(preencher_totais, migrations.RunPython.noop),
+    ]
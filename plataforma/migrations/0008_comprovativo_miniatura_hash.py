@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plataforma', '0007_totalapostas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deposito',
+            name='hash_comprovativo',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='deposito',
+            name='miniatura',
+            field=models.ImageField(blank=True, upload_to='comprovativos/miniaturas/'),
+        ),
+    ]
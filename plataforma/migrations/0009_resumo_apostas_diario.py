@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plataforma', '0008_comprovativo_miniatura_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoApostasDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('quantidade', models.PositiveIntegerField(default=0)),
+                ('vitorias', models.PositiveIntegerField(default=0)),
+                ('total_investido', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('total_ganho', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_apostas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'resumos diários de apostas',
+                'indexes': [models.Index(fields=['usuario', '-dia'], name='resumo_usuario_dia_idx')],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'dia'), name='resumo_usuario_dia_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plataforma', '0009_resumo_apostas_diario'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='deposito',
+            name='deposito_usuario_data_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='saque',
+            name='saque_usuario_data_idx',
+        ),
+        migrations.AddIndex(
+            model_name='deposito',
+            index=models.Index(fields=['usuario', '-data_criacao', '-id'], name='deposito_usuario_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saque',
+            index=models.Index(fields=['usuario', '-data_pedido', '-id'], name='saque_usuario_data_idx'),
+        ),
+    ]
@@ -1,8 +1,16 @@
-from django.db import models
+from django.db import IntegrityError, models, connections, router, transaction
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+CENTAVO = Decimal('0.01')
+
+class SaldoInsuficiente(Exception):
+    pass
+
+class RodadaEncerrada(Exception):
+    pass
+
 # --- USUÁRIO ---
 class UsuarioManager(BaseUserManager):
     def create_user(self, telefone, password=None, **extra_fields):
@@ -17,6 +25,94 @@ class UsuarioManager(BaseUserManager):
         extra_fields.setdefault('is_superuser', True)
         return self.create_user(telefone, password, **extra_fields)
 
+    # --- CADASTRO COM CONVITE (NO MÁXIMO 2 CONSULTAS) ---
+    def registrar_subordinado(self, telefone_padrinho):
+        """
+        Resolve o padrinho pelo telefone (índice único) e soma-lhe um subordinado
+        na mesma consulta: UPDATE ... RETURNING id. Devolve None se não existir.
+        """
+        db = router.db_for_write(self.model)
+        connection = connections[db]
+        tabela = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {tabela} SET total_subordinados = total_subordinados + 1 WHERE telefone = %s RETURNING id",
+                [telefone_padrinho],
+            )
+            linha = cursor.fetchone()
+        return linha[0] if linha else None
+
+    def cadastrar(self, telefone, password, pais, telefone_padrinho=None):
+        """
+        Cria o utilizador já completo (país e padrinho) num único INSERT.
+        Um telefone repetido, mesmo em cadastros simultâneos, é travado pela
+        restrição unique e levanta IntegrityError (o padrinho não é contado).
+        Telefone ou país em falta levantam ValueError, antes de tocar na base de dados.
+        """
+        if not telefone: raise ValueError('O telefone é obrigatório')
+        if not pais: raise ValueError('O país é obrigatório')
+        user = self.model(telefone=telefone, pais=pais)
+        user.set_password(password)
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            if telefone_padrinho:
+                user.convidado_por_id = self.registrar_subordinado(telefone_padrinho)
+            user.save(using=self._db)
+        return user
+
+    # --- MOVIMENTOS DE SALDO (ATÓMICOS) ---
+    def _aplicar_delta(self, usuario_id, valor):
+        """
+        UPDATE ... SET saldo = saldo + valor WHERE saldo + valor >= 0 RETURNING saldo.
+        Uma única ida à base de dados; devolve None se o saldo não chegar.
+        """
+        db = router.db_for_write(self.model)
+        connection = connections[db]
+        tabela = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {tabela} SET saldo = saldo + %s WHERE id = %s AND saldo + %s >= 0 RETURNING saldo",
+                [valor, usuario_id, valor],
+            )
+            linha = cursor.fetchone()
+        if linha is None:
+            return None
+        return Decimal(str(linha[0])).quantize(CENTAVO)
+
+    def movimentar_saldo(self, usuario_id, valor, tipo, referencia=''):
+        """
+        Soma `valor` ao saldo (negativo = débito) e regista o movimento no extrato.
+        Débitos sem saldo suficiente levantam SaldoInsuficiente. Devolve o novo saldo.
+        """
+        valor = Decimal(valor).quantize(CENTAVO)
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            novo_saldo = self._aplicar_delta(usuario_id, valor)
+            if novo_saldo is None:
+                raise SaldoInsuficiente()
+            MovimentoSaldo.objects.create(
+                usuario_id=usuario_id, tipo=tipo, valor=valor,
+                saldo_apos=novo_saldo, referencia=referencia,
+            )
+        return novo_saldo
+
+    def creditar_em_lote(self, creditos, tipo, referencia=''):
+        """
+        Credita vários utilizadores de uma vez: recebe [(usuario_id, valor), ...],
+        faz um UPDATE por utilizador e um único INSERT em lote no extrato.
+        """
+        movimentos = []
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            for usuario_id, valor in creditos:
+                valor = Decimal(valor).quantize(CENTAVO)
+                novo_saldo = self._aplicar_delta(usuario_id, valor)
+                if novo_saldo is None:
+                    continue
+                movimentos.append(MovimentoSaldo(
+                    usuario_id=usuario_id, tipo=tipo, valor=valor,
+                    saldo_apos=novo_saldo, referencia=referencia,
+                ))
+            MovimentoSaldo.objects.bulk_create(movimentos)
+        return {m.usuario_id: m.saldo_apos for m in movimentos}
+
 class Usuario(AbstractUser):
     username = None
     telefone = models.CharField(max_length=20, unique=True)
@@ -24,6 +120,10 @@ class Usuario(AbstractUser):
     codigo_convite = models.CharField(max_length=10, blank=True)
     convidado_por = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='subordinados')
     saldo = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    # Estatísticas de convite mantidas de forma incremental (ver cadastro_view e Deposito.save)
+    total_subordinados = models.PositiveIntegerField(default=0)
+    subordinados_ativos = models.PositiveIntegerField(default=0)
+    comissao_total = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
     USERNAME_FIELD = 'telefone'
     REQUIRED_FIELDS = []
     objects = UsuarioManager()
@@ -50,6 +150,54 @@ class MetodoReferencia(models.Model):
     def __str__(self): return f"{self.empresa} - {self.entidade}"
 
 # --- FINANCEIRO E JOGO ---
+COMISSAO_PADRINHO = Decimal('0.15')
+
+class DepositoQuerySet(models.QuerySet):
+    def aprovar(self):
+        """
+        Passa os depósitos PENDENTE do queryset para APROVADO numa só transação.
+        Os créditos aos utilizadores e as comissões de 15% aos padrinhos são
+        agrupados (um UPDATE por utilizador). As linhas ficam bloqueadas durante a
+        transação, por isso dois cliques simultâneos não creditam duas vezes.
+        Devolve o número de depósitos aprovados.
+        """
+        with transaction.atomic(using=self.db):
+            pendentes = list(
+                self.filter(status='PENDENTE').select_for_update(of=('self',))
+                .values_list('id', 'usuario_id', 'valor', 'usuario__convidado_por_id')
+            )
+            if not pendentes:
+                return 0
+            ids = [deposito_id for deposito_id, *_ in pendentes]
+
+            por_usuario = {}
+            por_padrinho = {}
+            for _, usuario_id, valor, padrinho_id in pendentes:
+                por_usuario[usuario_id] = por_usuario.get(usuario_id, 0) + valor
+                if padrinho_id:
+                    por_padrinho.setdefault(padrinho_id, set()).add(usuario_id)
+
+            # Subordinados que já tinham depósitos aprovados não contam como novos ativos
+            ja_ativos = set(
+                Deposito.objects.filter(usuario_id__in=por_usuario, status='APROVADO')
+                .values_list('usuario_id', flat=True).distinct()
+            )
+
+            Deposito.objects.filter(id__in=ids).update(status='APROVADO')
+            Usuario.objects.creditar_em_lote(por_usuario.items(), 'DEPOSITO', 'deposito:lote')
+
+            comissoes = {
+                padrinho_id: sum(por_usuario[u] for u in usuarios) * COMISSAO_PADRINHO
+                for padrinho_id, usuarios in por_padrinho.items()
+            }
+            Usuario.objects.creditar_em_lote(comissoes.items(), 'COMISSAO', 'deposito:lote')
+            for padrinho_id, usuarios in por_padrinho.items():
+                Usuario.objects.filter(id=padrinho_id).update(
+                    comissao_total=models.F('comissao_total') + comissoes[padrinho_id].quantize(CENTAVO),
+                    subordinados_ativos=models.F('subordinados_ativos') + len(usuarios - ja_ativos),
+                )
+        return len(ids)
+
 class Deposito(models.Model):
     METODOS = (('BANCO', 'Banco'), ('EXPRESS', 'Express'), ('REFERENCIA', 'Referência'))
     STATUS = (('PENDENTE', 'Pendente'), ('APROVADO', 'Aprovado'), ('REJEITADO', 'Rejeitado'))
@@ -57,21 +205,39 @@ class Deposito(models.Model):
     metodo = models.CharField(max_length=20, choices=METODOS)
     valor = models.DecimalField(max_digits=10, decimal_places=2)
     comprovativo = models.ImageField(upload_to='comprovativos/')
+    # Preenchidos em segundo plano por plataforma.comprovativos
+    miniatura = models.ImageField(upload_to='comprovativos/miniaturas/', blank=True)
+    hash_comprovativo = models.CharField(max_length=64, blank=True, db_index=True)
     nome_depositante = models.CharField(max_length=100)
     data_criacao = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS, default='PENDENTE')
 
+    objects = DepositoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['usuario', '-data_criacao', '-id'], name='deposito_usuario_data_idx'),
+            models.Index(fields=['status'], name='deposito_status_idx'),
+        ]
+
     def save(self, *args, **kwargs):
-        if self.pk:
-            velho = Deposito.objects.get(pk=self.pk)
-            if velho.status == 'PENDENTE' and self.status == 'APROVADO':
-                self.usuario.saldo += self.valor
-                self.usuario.save()
-                if self.usuario.convidado_por:
-                    padrinho = self.usuario.convidado_por
-                    padrinho.saldo += (self.valor * Decimal('0.15'))
-                    padrinho.save()
-        super().save(*args, **kwargs)
+        # Os créditos só são aplicados na transição PENDENTE -> APROVADO (ver DepositoQuerySet.aprovar)
+        if not self.pk or self.status != 'APROVADO':
+            return super().save(*args, **kwargs)
+        with transaction.atomic(using=router.db_for_write(Deposito, instance=self)):
+            gravado = Deposito.objects.select_for_update().filter(pk=self.pk).values('status', 'valor').first()
+            if gravado is None:
+                return super().save(*args, **kwargs)
+            if gravado['status'] == 'APROVADO' and gravado['valor'] != self.valor:
+                raise ValueError('O valor de um depósito aprovado não pode ser alterado.')
+            # Grava primeiro as alterações (ex.: valor corrigido) com o estado atual e só
+            # depois aprova: o crédito é sempre o valor que fica gravado. Um depósito
+            # rejeitado não passa a aprovado sem crédito.
+            self.status = gravado['status']
+            super().save(*args, **kwargs)
+            if self.status == 'PENDENTE':
+                Deposito.objects.filter(pk=self.pk).aprovar()
+                self.status = 'APROVADO'
 
 class Saque(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
@@ -79,20 +245,159 @@ class Saque(models.Model):
     status = models.CharField(max_length=20, default='PENDENTE')
     data_pedido = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['usuario', '-data_pedido', '-id'], name='saque_usuario_data_idx'),
+            models.Index(fields=['status'], name='saque_status_idx'),
+        ]
+
 class Rodada(models.Model):
+    # Número do ciclo de 40s (int(time.time()) // 40) a que a rodada pertence
+    ciclo = models.BigIntegerField(null=True, blank=True, unique=True)
     numero_sorteado = models.IntegerField(null=True, blank=True)
     ativa = models.BooleanField(default=True)
     data_inicio = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Índice parcial: só as (poucas) rodadas ativas
+            models.Index(fields=['ativa'], name='rodada_ativa_idx', condition=models.Q(ativa=True)),
+        ]
+
+    @classmethod
+    def bloquear_aberta(cls, rodada_id):
+        """
+        Dentro da transação da aposta: bloqueia a rodada e garante que ainda não
+        foi liquidada. A liquidação bloqueia a mesma linha (FOR UPDATE), por isso
+        uma aposta nunca entra numa rodada já fechada (ficaria pendente para sempre).
+        No PostgreSQL o bloqueio é partilhado (FOR SHARE): as apostas não esperam
+        umas pelas outras, só pela liquidação. No SQLite a transação IMMEDIATE já
+        serializa as escritas e o FOR UPDATE é ignorado.
+        """
+        db = router.db_for_write(cls)
+        connection = connections[db]
+        if connection.vendor == 'postgresql':
+            tabela = connection.ops.quote_name(cls._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT 1 FROM {tabela} WHERE id = %s AND ativa FOR SHARE", [rodada_id])
+                aberta = cursor.fetchone() is not None
+        else:
+            aberta = cls.objects.using(db).select_for_update().filter(id=rodada_id, ativa=True).exists()
+        if not aberta:
+            raise RodadaEncerrada
+
 class Aposta(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
     rodada = models.ForeignKey(Rodada, on_delete=models.CASCADE, related_name='apostas')
     valor_escolhido = models.IntegerField()
     valor_investido = models.DecimalField(max_digits=10, decimal_places=2)
     ganhou = models.BooleanField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['rodada', 'valor_escolhido'], name='aposta_rodada_opcao_idx'),
+            models.Index(fields=['usuario', '-id'], name='aposta_usuario_id_idx'),
+        ]
+
     def __str__(self):
         return f"Aposta de {self.usuario.telefone} - Kz {self.valor_investido}"
 
+# --- TOTAIS DE APOSTAS (MANTIDOS DE FORMA INCREMENTAL) ---
+class TotalApostasManager(models.Manager):
+    def registrar_apostas(self, rodada_id, quantidade, valor):
+        """Soma apostas novas ao total da rodada (cria a linha na primeira aposta)."""
+        incremento = {
+            'quantidade': models.F('quantidade') + quantidade,
+            'total_investido': models.F('total_investido') + valor,
+        }
+        if self.filter(rodada_id=rodada_id).update(**incremento):
+            return
+        try:
+            with transaction.atomic(using=self.db):
+                self.create(rodada_id=rodada_id, quantidade=quantidade, total_investido=valor)
+        except IntegrityError:
+            self.filter(rodada_id=rodada_id).update(**incremento)
+
+    def fechar_rodada(self, rodada_id, quantidade, investido, vencedoras, pago):
+        """
+        Grava os totais definitivos da rodada (calculados na liquidação) e soma-os
+        ao acumulado global.
+        """
+        valores = {
+            'quantidade': quantidade, 'total_investido': investido,
+            'total_vencedoras': vencedoras, 'total_perdedoras': investido - vencedoras,
+            'total_pago': pago,
+        }
+        self.update_or_create(rodada_id=rodada_id, defaults=valores)
+        incremento = {campo: models.F(campo) + valor for campo, valor in valores.items()}
+        if not self.filter(rodada__isnull=True).update(**incremento):
+            self.create(rodada=None, **valores)
+
+    def acumulado(self):
+        """Linha acumulada de todas as rodadas já liquidadas (rodada = NULL)."""
+        total, _ = self.get_or_create(rodada=None)
+        return total
+
+class TotalApostas(models.Model):
+    # rodada = NULL é o acumulado global das rodadas liquidadas
+    rodada = models.OneToOneField(Rodada, on_delete=models.CASCADE, null=True, blank=True, related_name='totais')
+    quantidade = models.PositiveIntegerField(default=0)
+    total_investido = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    total_vencedoras = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    total_perdedoras = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    total_pago = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    objects = TotalApostasManager()
+
+    class Meta:
+        verbose_name_plural = 'totais de apostas'
+
+# --- RESUMO DIÁRIO DAS APOSTAS ARQUIVADAS ---
+class ResumoApostasDiario(models.Model):
+    """
+    Apostas de rodadas antigas já liquidadas, agregadas por jogador e por dia
+    (preenchido pelo comando arquivar_rodadas, que apaga as linhas originais).
+    """
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='resumos_apostas')
+    dia = models.DateField()
+    quantidade = models.PositiveIntegerField(default=0)
+    vitorias = models.PositiveIntegerField(default=0)
+    total_investido = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    total_ganho = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = 'resumos diários de apostas'
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'dia'], name='resumo_usuario_dia_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['usuario', '-dia'], name='resumo_usuario_dia_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} {self.dia}: {self.quantidade} apostas"
+
+# --- EXTRATO (IMUTÁVEL) ---
+class MovimentoSaldo(models.Model):
+    TIPOS = (
+        ('APOSTA', 'Aposta'), ('PREMIO', 'Prémio'), ('DEPOSITO', 'Depósito'),
+        ('COMISSAO', 'Comissão'), ('SAQUE', 'Saque'),
+    )
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='movimentos')
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    valor = models.DecimalField(max_digits=12, decimal_places=2)
+    saldo_apos = models.DecimalField(max_digits=12, decimal_places=2)
+    referencia = models.CharField(max_length=50, blank=True)
+    data = models.DateTimeField(auto_now_add=True)
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError('Movimentos de saldo não podem ser alterados.')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.tipo} {self.valor} ({self.usuario_id})"
+
 class ConfiguracaoSistema(models.Model):
     link_whatsapp = models.URLField()
     instrucoes_jogo = models.TextField()
@@ -0,0 +1,66 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+TAMANHO_PAGINA = 20
+
+
+def codificar_cursor(valores):
+    dados = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in valores])
+    return base64.urlsafe_b64encode(dados.encode()).decode()
+
+
+def descodificar_cursor(cursor):
+    """Devolve a lista de valores do cursor. Levanta ValueError se o cursor for inválido."""
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, UnicodeError, json.JSONDecodeError, binascii.Error) as e:
+        raise ValueError('Cursor inválido') from e
+    if not isinstance(valores, list):
+        raise ValueError('Cursor inválido')
+    return valores
+
+
+def _filtro_apos(queryset, ordem, valores):
+    """
+    Constrói o filtro "depois do cursor" para a ordenação dada, ex. para
+    ('-data_criacao', '-id'): data < d OR (data = d AND id < i).
+    """
+    modelo = queryset.model
+    filtro = Q()
+    iguais = {}
+    for campo, valor in zip(ordem, valores):
+        nome = campo.lstrip('-')
+        try:
+            valor = modelo._meta.get_field(nome).to_python(valor)
+        except (TypeError, ValidationError) as e:
+            # Cursor forjado, ex. um número onde se espera uma data
+            raise ValueError('Cursor inválido') from e
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        filtro |= Q(**iguais, **{f'{nome}__{operador}': valor})
+        iguais[nome] = valor
+    return filtro
+
+
+def pagina_por_chave(queryset, ordem, cursor=None, limite=TAMANHO_PAGINA):
+    """
+    Paginação por chave (keyset): custo constante por página, seja qual for a
+    antiguidade da conta. `ordem` tem de terminar num campo único (ex. '-id').
+    Devolve (itens, proximo_cursor); proximo_cursor é None na última página.
+    """
+    queryset = queryset.order_by(*ordem)
+    if cursor:
+        valores = descodificar_cursor(cursor)
+        if len(valores) != len(ordem):
+            raise ValueError('Cursor inválido')
+        queryset = queryset.filter(_filtro_apos(queryset, ordem, valores))
+
+    itens = list(queryset[:limite + 1])
+    if len(itens) <= limite:
+        return itens, None
+    itens = itens[:limite]
+    ultimo = itens[-1]
+    return itens, codificar_cursor([getattr(ultimo, campo.lstrip('-')) for campo in ordem])
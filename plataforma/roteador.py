@@ -0,0 +1,52 @@
+"""
+Encaminhamento de leituras para a réplica (DATABASE_REPLICA_URL). Só as
+leituras marcadas com ler_da_replica()/leitura_replica vão para a réplica;
+tudo o resto, incluindo escritas e leituras dentro de transações do jogo,
+continua na base principal. Sem réplica configurada não altera nada.
+"""
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+REPLICA = 'replica'
+
+_usar_replica = contextvars.ContextVar('usar_replica', default=False)
+
+
+@contextmanager
+def ler_da_replica():
+    token = _usar_replica.set(True)
+    try:
+        yield
+    finally:
+        _usar_replica.reset(token)
+
+
+def leitura_replica(view):
+    """Decorador para views só de leitura (histórico, equipa)."""
+    @wraps(view)
+    def envolvida(request, *args, **kwargs):
+        with ler_da_replica():
+            return view(request, *args, **kwargs)
+    return envolvida
+
+
+class RoteadorReplica:
+    def __init__(self, replica=None):
+        if replica is None and REPLICA in settings.DATABASES:
+            replica = REPLICA
+        self.replica = replica
+
+    def db_for_read(self, model, **hints):
+        if self.replica and _usar_replica.get():
+            return self.replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica e principal têm os mesmos dados
+        return True
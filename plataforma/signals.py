@@ -0,0 +1,8 @@
+from django.db.models.signals import post_delete, post_save
+
+from .configuracao import invalidar_configuracao
+from .models import ConfiguracaoSistema, MetodoBanco, MetodoExpress, MetodoReferencia
+
+for modelo in (ConfiguracaoSistema, MetodoBanco, MetodoExpress, MetodoReferencia):
+    post_save.connect(invalidar_configuracao, sender=modelo, dispatch_uid=f'configuracao_save_{modelo.__name__}')
+    post_delete.connect(invalidar_configuracao, sender=modelo, dispatch_uid=f'configuracao_delete_{modelo.__name__}')
@@ -1,3 +1,606 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from decimal import Decimal, InvalidOperation
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from .arquivo import arquivar_lote, corte_em_dias
+from .benchmark import fase_de_apostas
+from .cache_sessoes import CacheSessoesFicheiros
+from .comprovativos import processar_comprovativo
+from .configuracao import CHAVE_VERSAO, obter_configuracao
+from .eventos import difusor
+from .limitador import LimitadorTentativas
+from .liquidacao import apostas_por_opcao, exposicao_da_rodada, liquidar_rodada
+from .models import (Aposta, Deposito, MetodoBanco, MetodoExpress, MovimentoSaldo, ResumoApostasDiario,
+                     Rodada, RodadaEncerrada, SaldoInsuficiente, Saque, TotalApostas, Usuario)
+from .paginacao import TAMANHO_PAGINA, codificar_cursor, pagina_por_chave
+from .roteador import RoteadorReplica, ler_da_replica
+from . import views
+from .views import _registrar_aposta, _validar_aposta
+
+
+class PlanoConsultasTests(TestCase):
+    """
+    Garante que as consultas das views mais usadas continuam a usar índices
+    (SQLite e PostgreSQL) em vez de varrer a tabela inteira.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(telefone='923000000', password='x')
+        cls.rodada = Rodada.objects.create(ativa=True)
+
+    def consultas_quentes(self):
+        consultas = {
+            # As mesmas consultas das views: ordenação de HISTORICO aplicada como em pagina_por_chave
+            f'historico_{tipo}': consulta(self.usuario).order_by(*ordem)[:TAMANHO_PAGINA + 1]
+            for tipo, (consulta, ordem, _) in views.HISTORICO.items()
+        }
+        return consultas | {
+            'liquidacao_agrupada': apostas_por_opcao(self.rodada.id),
+            'liquidacao_por_opcao': Aposta.objects.filter(rodada=self.rodada, valor_escolhido=2),
+            'rodada_ativa': Rodada.objects.filter(ativa=True),
+            'admin_depositos_status': Deposito.objects.filter(status='PENDENTE'),
+            'admin_saques_status': Saque.objects.filter(status='PENDENTE'),
+        }
+
+    def plano(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Com tabelas vazias o planeador prefere Seq Scan; desligamos para ver se há índice utilizável
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_consultas_quentes_usam_indices(self):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest('Plano de execução só verificado em SQLite e PostgreSQL')
+
+        for nome, queryset in self.consultas_quentes().items():
+            with self.subTest(nome):
+                plano = self.plano(queryset)
+                if connection.vendor == 'sqlite':
+                    self.assertIn('USING', plano, plano)
+                    self.assertNotIn('USE TEMP B-TREE', plano, plano)
+                else:
+                    self.assertNotIn('Seq Scan', plano, plano)
+
+
+class SaqueAdminTests(TestCase):
+    """O changelist de saques deve custar o mesmo número de consultas seja qual for a página."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_superuser(telefone='900000000', password='x')
+        MetodoBanco.objects.create(nome_banco='BAI', titular='Jogo Sortudo', iban='AO06000000000')
+        MetodoExpress.objects.create(numero_telefone='923111111')
+
+    def criar_saques(self, quantidade):
+        inicio = Usuario.objects.count()
+        usuarios = Usuario.objects.bulk_create([
+            Usuario(telefone=f'92{inicio + i:07d}') for i in range(quantidade)
+        ])
+        Saque.objects.bulk_create([Saque(usuario=usuario, valor=2500) for usuario in usuarios])
+
+    def consultas_changelist(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('admin:plataforma_saque_changelist'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, 'BAI')
+        return len(consultas)
+
+    def test_numero_de_consultas_constante(self):
+        self.criar_saques(2)
+        poucas = self.consultas_changelist()
+        self.criar_saques(40)
+        muitas = self.consultas_changelist()
+        self.assertEqual(poucas, muitas)
+
+
+class CadastroTests(TestCase):
+    """O cadastro com convite custa no máximo 2 consultas e o telefone repetido é travado pela base."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.padrinho = Usuario.objects.create_user(telefone='923000001', password='x')
+
+    def consultas_cadastro(self, **kwargs):
+        with CaptureQueriesContext(connection) as consultas:
+            usuario = Usuario.objects.cadastrar(**kwargs)
+        # Os SAVEPOINT/RELEASE vêm do TestCase, em produção é a própria transação
+        return usuario, [q for q in consultas if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+
+    def test_cadastro_com_convite_em_duas_consultas(self):
+        usuario, consultas = self.consultas_cadastro(
+            telefone='923000002', password='x', pais='Angola', telefone_padrinho='923000001')
+        self.assertLessEqual(len(consultas), 2, [q['sql'] for q in consultas])
+        usuario.refresh_from_db()
+        self.assertEqual(usuario.convidado_por_id, self.padrinho.id)
+        self.assertEqual(usuario.pais, 'Angola')
+        self.padrinho.refresh_from_db()
+        self.assertEqual(self.padrinho.total_subordinados, 1)
+
+    def test_convite_inexistente_e_ignorado(self):
+        usuario, consultas = self.consultas_cadastro(
+            telefone='923000003', password='x', pais='Brasil', telefone_padrinho='000')
+        self.assertLessEqual(len(consultas), 2)
+        self.assertIsNone(usuario.convidado_por_id)
+
+    def test_telefone_e_pais_obrigatorios(self):
+        for telefone, pais in (('', 'Angola'), ('923000004', ''), ('923000004', None)):
+            with self.subTest(telefone=telefone, pais=pais), self.assertRaises(ValueError):
+                Usuario.objects.cadastrar(telefone, 'x', pais, telefone_padrinho='923000001')
+        self.assertFalse(Usuario.objects.filter(telefone__in=['', '923000004']).exists())
+        self.padrinho.refresh_from_db()
+        self.assertEqual(self.padrinho.total_subordinados, 0)
+
+    def test_view_so_mostra_numero_repetido_para_telefone_repetido(self):
+        url = reverse('cadastro')
+        resposta = self.client.post(url, {'telefone': '923000005', 'password': 'x'}, follow=True)
+        self.assertEqual([str(m) for m in resposta.context['messages']], ['O país é obrigatório'])
+        resposta = self.client_class().post(url, {'telefone': '923000001', 'password': 'x', 'pais': 'Angola'}, follow=True)
+        self.assertEqual([str(m) for m in resposta.context['messages']], ['Este número já está cadastrado.'])
+
+    def test_telefone_repetido_nao_conta_subordinado(self):
+        with self.assertRaises(IntegrityError):
+            Usuario.objects.cadastrar('923000001', 'x', 'Angola', telefone_padrinho='923000001')
+        self.padrinho.refresh_from_db()
+        self.assertEqual(self.padrinho.total_subordinados, 0)
+
+
+class RoteadorReplicaTests(SimpleTestCase):
+    """Só as leituras marcadas vão à réplica; as escritas ficam sempre na principal."""
+
+    def test_leituras_marcadas_vao_a_replica(self):
+        roteador = RoteadorReplica(replica='replica')
+        self.assertIsNone(roteador.db_for_read(Aposta))
+        with ler_da_replica():
+            self.assertEqual(roteador.db_for_read(Aposta), 'replica')
+            self.assertIsNone(roteador.db_for_write(Aposta))
+        self.assertIsNone(roteador.db_for_read(Aposta))
+
+    def test_sem_replica_nao_muda_nada(self):
+        with ler_da_replica():
+            self.assertIsNone(RoteadorReplica().db_for_read(Aposta))
+
+
+class ArquivoRodadasTests(TestCase):
+    """Rodadas antigas passam a resumos diários; as recentes e as abertas ficam intactas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(telefone='923000010', password='x')
+        antiga = corte_em_dias(30) - timedelta(days=1)
+        cls.antigas = []
+        for numero in (3, 5):
+            rodada = Rodada.objects.create(ativa=False, numero_sorteado=numero)
+            Rodada.objects.filter(id=rodada.id).update(data_inicio=antiga)
+            Aposta.objects.create(usuario=cls.usuario, rodada=rodada, valor_escolhido=3,
+                                  valor_investido=1000, ganhou=numero == 3)
+            Aposta.objects.create(usuario=cls.usuario, rodada=rodada, valor_escolhido=6,
+                                  valor_investido=500, ganhou=False)
+            TotalApostas.objects.create(rodada=rodada, quantidade=2, total_investido=1500)
+            cls.antigas.append(rodada.id)
+        cls.recente = Rodada.objects.create(ativa=False, numero_sorteado=2)
+        Aposta.objects.create(usuario=cls.usuario, rodada=cls.recente, valor_escolhido=2,
+                              valor_investido=1000, ganhou=True)
+
+    def test_arquiva_em_lotes_e_retoma(self):
+        corte = corte_em_dias(30)
+        self.assertEqual(arquivar_lote(corte, 1).rodadas, 1)
+        self.assertEqual(arquivar_lote(corte, 1).apostas, 2)
+        self.assertIsNone(arquivar_lote(corte, 1))
+
+        resumo = ResumoApostasDiario.objects.get(usuario=self.usuario)
+        self.assertEqual((resumo.quantidade, resumo.vitorias), (4, 1))
+        self.assertEqual(resumo.total_investido, Decimal('3000'))
+        self.assertEqual(resumo.total_ganho, Decimal('3000'))
+        self.assertFalse(Rodada.objects.filter(id__in=self.antigas).exists())
+        self.assertFalse(TotalApostas.objects.filter(rodada_id__in=self.antigas).exists())
+        self.assertEqual(list(Aposta.objects.values_list('rodada_id', flat=True)), [self.recente.id])
+
+    def test_historico_mostra_recentes_e_arquivadas(self):
+        arquivar_lote(corte_em_dias(30), 10)
+        self.client.force_login(self.usuario)
+        resposta = self.client.get(reverse('historico'))
+        self.assertEqual(len(resposta.context['apostas']), 1)
+        self.assertEqual(len(resposta.context['resumos']), 1)
+
+
+class PaginacaoTests(SimpleTestCase):
+    def test_cursor_forjado_e_invalido(self):
+        for valores in ([1, 1], [{}, 1], ['ontem', 1]):
+            with self.assertRaisesMessage(ValueError, 'Cursor inválido'):
+                pagina_por_chave(Deposito.objects.all(), ('-data_criacao', '-id'), codificar_cursor(valores))
+
+
+class ApostaRodadaEncerradaTests(TestCase):
+    """Uma aposta que chega depois da liquidação é recusada e não debita o saldo."""
+
+    def test_aposta_em_rodada_liquidada_e_recusada(self):
+        usuario = Usuario.objects.create_user(telefone='923000020', password='x', saldo=100)
+        rodada = Rodada.objects.create(ativa=True)
+        liquidar_rodada(rodada.id)
+        with self.assertRaises(RodadaEncerrada):
+            _registrar_aposta(usuario.id, rodada.id, 2, Decimal('10'))
+        usuario.refresh_from_db()
+        self.assertEqual(usuario.saldo, Decimal('100'))
+        self.assertFalse(Aposta.objects.filter(rodada=rodada).exists())
+
+
+class LiquidacaoTests(TestCase):
+    """liquidar_rodada: vencedor, marcação das apostas, créditos, totais e idempotência."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.a = Usuario.objects.create_user(telefone='923000030', password='x')
+        cls.b = Usuario.objects.create_user(telefone='923000031', password='x')
+        cls.c = Usuario.objects.create_user(telefone='923000032', password='x')
+
+    def setUp(self):
+        # Contadores de exposição de outros testes (os ids das rodadas repetem-se)
+        cache.clear()
+
+    def rodada_com(self, *apostas):
+        rodada = Rodada.objects.create(ativa=True)
+        Aposta.objects.bulk_create([
+            Aposta(usuario=usuario, rodada=rodada, valor_escolhido=opcao, valor_investido=valor)
+            for usuario, opcao, valor in apostas
+        ])
+        return rodada
+
+    def test_vence_a_opcao_mais_barata(self):
+        # Custo para a casa: 0->1000, 2->1000, 3->450, 4->800, 5->1000, 6->600
+        rodada = self.rodada_com(
+            (self.c, 0, 1000), (self.b, 2, 500), (self.a, 3, 100), (self.a, 3, 50),
+            (self.c, 4, 200), (self.b, 5, 200), (self.c, 6, 100),
+        )
+        resultado = liquidar_rodada(rodada.id)
+
+        self.assertEqual(resultado.numero_sorteado, 3)
+        self.assertEqual((resultado.apostas_vencedoras, resultado.apostas_perdedoras), (2, 5))
+        rodada.refresh_from_db()
+        self.assertEqual((rodada.ativa, rodada.numero_sorteado), (False, 3))
+        self.assertEqual(set(Aposta.objects.filter(ganhou=True).values_list('usuario_id', flat=True)), {self.a.id})
+        self.assertFalse(Aposta.objects.filter(rodada=rodada, ganhou__isnull=True).exists())
+
+        # Um só crédito para o jogador com duas apostas vencedoras
+        premios = MovimentoSaldo.objects.filter(tipo='PREMIO')
+        self.assertEqual([(m.usuario_id, m.valor) for m in premios], [(self.a.id, Decimal('450'))])
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.saldo, Decimal('450'))
+
+        esperado = {'quantidade': 7, 'total_investido': Decimal('2150'), 'total_vencedoras': Decimal('150'),
+                    'total_perdedoras': Decimal('2000'), 'total_pago': Decimal('450')}
+        for totais in (TotalApostas.objects.get(rodada=rodada), TotalApostas.objects.acumulado()):
+            self.assertEqual({campo: getattr(totais, campo) for campo in esperado}, esperado)
+
+    def test_segunda_liquidacao_nao_faz_nada(self):
+        rodada = self.rodada_com((self.a, 0, 100), *[(self.b, opcao, 100) for opcao in (2, 3, 4, 5, 6)])
+        primeiro = liquidar_rodada(rodada.id)
+        segundo = liquidar_rodada(rodada.id)
+        self.assertEqual(segundo.numero_sorteado, primeiro.numero_sorteado)
+        self.assertEqual(segundo.apostas_vencedoras, 0)
+        self.assertEqual(MovimentoSaldo.objects.filter(tipo='PREMIO').count(), 1)
+        self.assertEqual(TotalApostas.objects.acumulado().quantidade, 6)
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.saldo, Decimal('100'))
+
+    def test_opcao_zero_devolve_o_valor(self):
+        rodada = self.rodada_com((self.a, 0, 100), *[(self.b, opcao, 100) for opcao in (2, 3, 4, 5, 6)])
+        self.assertEqual(liquidar_rodada(rodada.id).numero_sorteado, 0)
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.saldo, Decimal('100'))
+
+    def test_aposta_gravada_sem_contador_nao_fica_de_fora(self):
+        # Uma aposta já gravada cujo contador na cache ainda não subiu
+        self.a.saldo = self.b.saldo = 1000
+        Usuario.objects.bulk_update([self.a, self.b], ['saldo'])
+        rodada = Rodada.objects.create(ativa=True)
+        for opcao in (0, 2, 3, 4, 5):
+            _registrar_aposta(self.b.id, rodada.id, opcao, Decimal('100'))
+        with mock.patch('plataforma.views.registrar_exposicao'):
+            _registrar_aposta(self.a.id, rodada.id, 6, Decimal('10'))
+
+        resultado = liquidar_rodada(rodada.id)
+        self.assertFalse(resultado.exposicao_em_cache)
+        self.assertEqual(resultado.numero_sorteado, 6)
+        self.assertEqual(TotalApostas.objects.get(rodada=rodada).quantidade, 6)
+
+    def test_erro_da_cache_nao_falha_a_aposta(self):
+        # A aposta já está gravada e debitada quando os contadores sobem
+        self.b.saldo = 1000
+        self.b.save(update_fields=['saldo'])
+        rodada = Rodada.objects.create(ativa=True)
+        with mock.patch('plataforma.liquidacao.cache.incr', side_effect=ConnectionError):
+            with self.assertLogs('plataforma.liquidacao', 'ERROR'):
+                _, saldo = _registrar_aposta(self.b.id, rodada.id, 2, Decimal('100'))
+        self.assertEqual(saldo, Decimal('900'))
+        self.assertFalse(liquidar_rodada(rodada.id).exposicao_em_cache)
+
+    def test_contadores_com_total_errado_nao_contam(self):
+        # Mesma quantidade de apostas, mas o contador de uma opção ficou desfasado
+        self.b.saldo = 1000
+        self.b.save(update_fields=['saldo'])
+        rodada = Rodada.objects.create(ativa=True)
+        for opcao in (0, 2, 3, 4, 5, 6):
+            _registrar_aposta(self.b.id, rodada.id, opcao, Decimal('100'))
+        cache.incr(f'exposicao:{rodada.id}:6', 5000)
+
+        quantidade, totais, em_cache = exposicao_da_rodada(rodada.id)
+        self.assertFalse(em_cache)
+        self.assertEqual((quantidade, totais[6]), (6, Decimal('100')))
+        resultado = liquidar_rodada(rodada.id)
+        self.assertFalse(resultado.exposicao_em_cache)
+        self.assertEqual(TotalApostas.objects.get(rodada=rodada).total_investido, Decimal('600'))
+
+    def test_consultas_nao_crescem_com_as_apostas(self):
+        def consultas(extra):
+            rodada = self.rodada_com(
+                (self.a, 0, 10), *[(self.b, opcao, 100) for opcao in (2, 3, 4, 5, 6)] * extra)
+            with CaptureQueriesContext(connection) as capturadas:
+                liquidar_rodada(rodada.id)
+            return len(capturadas)
+
+        self.assertEqual(consultas(1), consultas(50))
+
+
+class SaldoTests(TestCase):
+    """O saldo e o extrato (MovimentoSaldo) andam sempre juntos; débitos sem saldo não deixam rasto."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(telefone='923000040', password='x', saldo=1000)
+
+    def assertExtratoBate(self, usuario):
+        usuario.refresh_from_db()
+        movimentos = list(MovimentoSaldo.objects.filter(usuario=usuario).order_by('id'))
+        self.assertEqual(Decimal('1000') + sum(m.valor for m in movimentos), usuario.saldo)
+        if movimentos:
+            self.assertEqual(movimentos[-1].saldo_apos, usuario.saldo)
+        return usuario.saldo
+
+    def test_movimentos_atualizam_saldo_e_extrato(self):
+        Usuario.objects.movimentar_saldo(self.usuario.id, 250, 'DEPOSITO')
+        novo = Usuario.objects.movimentar_saldo(self.usuario.id, Decimal('-1250'), 'SAQUE')
+        self.assertEqual(novo, Decimal('0'))
+        self.assertEqual(self.assertExtratoBate(self.usuario), Decimal('0'))
+
+    def test_debito_a_descoberto_levanta_erro(self):
+        with self.assertRaises(SaldoInsuficiente):
+            Usuario.objects.movimentar_saldo(self.usuario.id, Decimal('-1000.01'), 'SAQUE')
+        self.assertEqual(self.assertExtratoBate(self.usuario), Decimal('1000'))
+        self.assertFalse(MovimentoSaldo.objects.exists())
+
+    def test_credito_em_lote_um_movimento_por_jogador(self):
+        outro = Usuario.objects.create_user(telefone='923000041', password='x', saldo=1000)
+        saldos = Usuario.objects.creditar_em_lote([(self.usuario.id, 10), (outro.id, 20)], 'PREMIO')
+        self.assertEqual(saldos, {self.usuario.id: Decimal('1010'), outro.id: Decimal('1020')})
+        self.assertExtratoBate(self.usuario)
+        self.assertExtratoBate(outro)
+
+    def test_saque_sem_saldo_nao_fica_gravado(self):
+        self.client.force_login(self.usuario)
+        self.client.post(reverse('sacar'), {'valor': '2500'})
+        self.assertFalse(Saque.objects.exists())
+        self.assertEqual(self.assertExtratoBate(self.usuario), Decimal('1000'))
+
+    def test_aposta_sem_saldo_nao_fica_gravada(self):
+        self.client.force_login(self.usuario)
+        with fase_de_apostas(ciclo=-40):
+            resposta = self.client.post(reverse('fazer_aposta'), {'numero_escolhido': 2, 'valor_investido': '1000.01'})
+            self.assertEqual(resposta.status_code, 400)
+            resposta = self.client.post(reverse('fazer_apostas_lote'), {
+                'apostas': [{'numero_escolhido': 2, 'valor_investido': 600}] * 2,
+            }, content_type='application/json')
+            self.assertEqual(resposta.status_code, 400)
+            self.assertFalse(Aposta.objects.exists())
+            self.assertEqual(self.assertExtratoBate(self.usuario), Decimal('1000'))
+
+            resposta = self.client.post(reverse('fazer_aposta'), {'numero_escolhido': 2, 'valor_investido': '1000'})
+            self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(Aposta.objects.count(), 1)
+        self.assertEqual(self.assertExtratoBate(self.usuario), Decimal('0'))
+
+
+class ValidacaoApostaTests(TestCase):
+    """Valores não finitos, enormes ou com mais de 2 casas e números fora das opções dão 400."""
+
+    INVALIDAS = [(2, 'NaN'), (2, 'Infinity'), (2, '1e30'), (2, '0.001'), (2, '0'), (2, '-5'), (9, '100')]
+
+    def test_validar_aposta(self):
+        self.assertEqual(_validar_aposta('3', '10.50'), (3, Decimal('10.50')))
+        for numero, valor in self.INVALIDAS:
+            with self.subTest(numero=numero, valor=valor), self.assertRaises((ValueError, InvalidOperation)):
+                _validar_aposta(numero, valor)
+
+    def test_endpoints_recusam_com_400(self):
+        usuario = Usuario.objects.create_user(telefone='923000050', password='x', saldo=1000)
+        self.client.force_login(usuario)
+        with fase_de_apostas(ciclo=-41):
+            for numero, valor in self.INVALIDAS:
+                with self.subTest(numero=numero, valor=valor):
+                    resposta = self.client.post(reverse('fazer_aposta'),
+                                                {'numero_escolhido': numero, 'valor_investido': valor})
+                    self.assertEqual(resposta.status_code, 400)
+                    resposta = self.client.post(reverse('fazer_apostas_lote'), {
+                        'apostas': [{'numero_escolhido': numero, 'valor_investido': valor}],
+                    }, content_type='application/json')
+                    self.assertEqual(resposta.status_code, 400)
+        self.assertFalse(Aposta.objects.exists())
+
+
+class ConfiguracaoCacheTests(TestCase):
+    """A versão da configuração só muda depois do commit da alteração."""
+
+    def test_invalida_so_depois_do_commit(self):
+        obter_configuracao()
+        versao = cache.get(CHAVE_VERSAO)
+        with self.captureOnCommitCallbacks(execute=True):
+            MetodoBanco.objects.create(nome_banco='BAI', titular='Jogo', iban='AO06')
+            self.assertEqual(cache.get(CHAVE_VERSAO), versao)
+        self.assertNotEqual(cache.get(CHAVE_VERSAO), versao)
+        self.assertEqual([banco.nome_banco for banco in obter_configuracao().bancos], ['BAI'])
+
+
+class LimitadorTentativasTests(SimpleTestCase):
+    def test_bloqueia_depois_do_maximo(self):
+        limitador = LimitadorTentativas(maximo=2)
+        limitador.registar_falha('923')
+        self.assertFalse(limitador.bloqueado('923'))
+        limitador.registar_falha('923')
+        self.assertTrue(limitador.bloqueado('923'))
+        limitador.limpar('923')
+        self.assertFalse(limitador.bloqueado('923'))
+
+    def test_numero_de_telefones_guardados_e_limitado(self):
+        limitador = LimitadorTentativas(maximo=2, max_chaves=100)
+        for i in range(1000):
+            limitador.registar_falha(f'9{i}')
+            if i >= 990:
+                limitador.registar_falha('alvo')  # continua a ser atacado: fica
+        self.assertEqual(len(limitador._falhas), 100)
+        self.assertTrue(limitador.bloqueado('alvo'))
+        self.assertNotIn('90', limitador._falhas)
+        self.assertIn('9999', limitador._falhas)
+
+
+class AprovacaoDepositoTests(TestCase):
+    """aprovar(): créditos agrupados, comissão de 15% ao padrinho, subordinados ativos e idempotência."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.padrinho = Usuario.objects.create_user(telefone='923000060', password='x')
+        cls.s1 = Usuario.objects.create_user(telefone='923000061', password='x', convidado_por=cls.padrinho)
+        cls.s2 = Usuario.objects.create_user(telefone='923000062', password='x', convidado_por=cls.padrinho)
+        cls.sem_padrinho = Usuario.objects.create_user(telefone='923000063', password='x')
+        # s1 já era ativo: não conta outra vez nos subordinados ativos
+        cls.depositar(cls.s1, 100, status='APROVADO')
+        for usuario, valor in ((cls.s1, 1000), (cls.s1, 500), (cls.s2, 2000), (cls.sem_padrinho, 300)):
+            cls.depositar(usuario, valor)
+
+    @staticmethod
+    def depositar(usuario, valor, status='PENDENTE'):
+        return Deposito.objects.create(usuario=usuario, metodo='BANCO', valor=valor, status=status,
+                                       comprovativo='comprovativos/x.png', nome_depositante='Teste')
+
+    def saldos(self):
+        return {u.telefone: u.saldo for u in Usuario.objects.order_by('telefone')}
+
+    def test_aprovar_agrupa_creditos_e_paga_comissao(self):
+        self.assertEqual(Deposito.objects.filter(status='PENDENTE').aprovar(), 4)
+        self.assertEqual(self.saldos(), {
+            '923000060': Decimal('525'), '923000061': Decimal('1500'),
+            '923000062': Decimal('2000'), '923000063': Decimal('300'),
+        })
+        self.assertEqual(MovimentoSaldo.objects.filter(usuario=self.s1, tipo='DEPOSITO').count(), 1)
+        self.assertEqual(MovimentoSaldo.objects.filter(usuario=self.padrinho, tipo='COMISSAO').count(), 1)
+        self.padrinho.refresh_from_db()
+        self.assertEqual(self.padrinho.comissao_total, Decimal('525'))
+        self.assertEqual(self.padrinho.subordinados_ativos, 1)
+
+        # Segunda aprovação (ex.: dois cliques) não credita nada
+        saldos = self.saldos()
+        self.assertEqual(Deposito.objects.all().aprovar(), 0)
+        self.assertEqual(self.saldos(), saldos)
+        self.padrinho.refresh_from_db()
+        self.assertEqual(self.padrinho.subordinados_ativos, 1)
+
+    def test_aprovar_pelo_save_credita_o_valor_gravado(self):
+        deposito = Deposito.objects.get(usuario=self.s2)
+        deposito.valor = Decimal('800')
+        deposito.status = 'APROVADO'
+        deposito.save()
+        deposito.refresh_from_db()
+        self.assertEqual((deposito.status, deposito.valor), ('APROVADO', Decimal('800')))
+        self.s2.refresh_from_db()
+        self.assertEqual(self.s2.saldo, Decimal('800'))
+
+        deposito.valor = Decimal('900')
+        with self.assertRaises(ValueError):
+            deposito.save()
+
+    def test_metodo_desconhecido_e_recusado(self):
+        self.client.force_login(self.s1)
+        self.client.post(reverse('depositar'), {
+            'metodo': '<img src=x onerror=alert(1)>', 'valor': '1000', 'nome_depositante': 'Teste',
+        })
+        self.assertFalse(Deposito.objects.filter(metodo__contains='<').exists())
+
+    def test_rejeitado_nao_passa_a_aprovado_sem_credito(self):
+        deposito = Deposito.objects.get(usuario=self.sem_padrinho)
+        Deposito.objects.filter(pk=deposito.pk).update(status='REJEITADO')
+        deposito.status = 'APROVADO'
+        deposito.save()
+        deposito.refresh_from_db()
+        self.assertEqual(deposito.status, 'REJEITADO')
+        self.assertEqual(self.saldos()['923000063'], Decimal('0'))
+
+
+class ComprovativoTests(TestCase):
+    def test_bomba_de_descompressao_fica_marcada(self):
+        # Senão processar_comprovativos falharia sempre no mesmo depósito
+        usuario = Usuario.objects.create_user(telefone='923000080', password='x')
+        png = io.BytesIO()
+        Image.new('RGB', (100, 100)).save(png, 'PNG')
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media), \
+                mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 10):
+            deposito = Deposito.objects.create(
+                usuario=usuario, metodo='BANCO', valor=1000, nome_depositante='Teste',
+                comprovativo=SimpleUploadedFile('x.png', png.getvalue()))
+            with self.assertLogs('plataforma.comprovativos', 'WARNING'):
+                processar_comprovativo(deposito.id)
+        deposito.refresh_from_db()
+        self.assertNotEqual(deposito.hash_comprovativo, '')
+
+
+class EventosRodadaTests(TestCase):
+    async def test_so_subscreve_quando_o_fluxo_comeca(self):
+        # Um cliente que sai antes de o fluxo arrancar não deixa fila nem relógio para trás
+        usuario = await Usuario.objects.acreate(telefone='923000070')
+        await self.async_client.aforce_login(usuario)
+        resposta = await self.async_client.get(reverse('eventos_rodada'))
+        self.assertEqual(resposta['Content-Type'], 'text/event-stream')
+        self.assertEqual(difusor.subscritores, set())
+        self.assertIsNone(difusor.tarefa)
+
+
+class CacheSessoesTests(SimpleTestCase):
+    def test_limpa_expiradas_no_maximo_uma_vez_por_intervalo(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            sessoes = CacheSessoesFicheiros(pasta, {'OPTIONS': {'INTERVALO_LIMPEZA': 60}})
+            sessoes.set('antiga', 1)
+            sessoes.set('recente', 2)
+            antiga = sessoes._key_to_file('antiga')
+            os.utime(antiga, (0, 0))
+
+            with mock.patch('plataforma.cache_sessoes.os.scandir', wraps=os.scandir) as listar:
+                sessoes.set('outra', 3)
+                sessoes._proxima_limpeza = 0
+                sessoes.set('mais_outra', 4)
+            self.assertEqual(listar.call_count, 1)
+            self.assertFalse(os.path.exists(antiga))
+            self.assertEqual(sessoes.get('recente'), 2)
+
+
+class AgendadorRodadasTests(SimpleTestCase):
+    def test_erro_num_ciclo_nao_para_o_worker(self):
+        # O ciclo 100 falha na liquidação; a rodada é recuperada depois do ciclo 101
+        comando = 'plataforma.management.commands.agendador_rodadas'
+        with mock.patch(f'{comando}.ciclo_atual', side_effect=[100, 100, 101]), \
+                mock.patch(f'{comando}.Command.executar_ciclo', side_effect=[RuntimeError, None]), \
+                mock.patch(f'{comando}.Command.recuperar_rodadas_pendentes') as recuperar:
+            with self.assertLogs(comando, 'ERROR'):
+                call_command('agendador_rodadas', ciclos=2)
+        self.assertEqual(recuperar.call_count, 2)
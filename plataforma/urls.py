@@ -14,7 +14,10 @@ urlpatterns = [
     # JOGO E INTERATIVIDADE
     path('jogo/', views.home_jogo, name='home_jogo'), # O Cassino de Dados
     path('apostar/', views.fazer_aposta, name='fazer_aposta'), # Lógica de investimento
+    path('apostar/lote/', views.fazer_apostas_lote, name='fazer_apostas_lote'), # Várias apostas num pedido
     
+    path('eventos/', views.eventos_rodada, name='eventos_rodada'), # Fase e resultado em tempo real (SSE)
+
     # --- ROTA CRÍTICA PARA CORREÇÃO DE SALDO ---
     path('processar-resultado/', views.processar_resultado_final, name='processar_resultado'),
     
@@ -23,5 +26,10 @@ urlpatterns = [
     path('sacar/', views.sacar, name='sacar'), # Saque mínimo 2500kz
     path('convite/', views.pagina_convite, name='convite'), # Link e 15% de comissão 
     path('historico/', views.historico_view, name='historico'), # Depósitos, ganhos e perdas
+    path('historico/api/', views.historico_api, name='historico_api'), # Páginas seguintes (JSON)
+
+    # OPERAÇÃO
+    path('metricas/', views.metricas, name='metricas'), # Só staff, formato Prometheus
+    path('exposicao/', views.exposicao_rodada, name='exposicao_rodada'), # Só staff, custo por número
 ]
 
@@ -1,16 +1,35 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate
 from django.contrib import messages
 from .models import (
-    Usuario, Deposito, Saque, Rodada, Aposta, 
-    ConfiguracaoSistema, MetodoBanco, MetodoExpress, MetodoReferencia
+    Usuario, Deposito, Saque, Aposta, Rodada, TotalApostas, ResumoApostasDiario, SaldoInsuficiente,
+    RodadaEncerrada, CENTAVO,
 )
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from decimal import Decimal
-from django.db.models import Sum
-import random
-import time
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.exceptions import ValidationError
+from django.utils.dateformat import format as date_format
+from django.utils.timezone import localtime
+from .ciclo import arodada_do_ciclo, estado_ciclo, rodada_do_ciclo
+from .comprovativos import agendar_processamento
+from .configuracao import obter_configuracao
+from .eventos import difusor, formatar_evento
+from .instrumentacao import registo
+from .limitador import tentativas_login
+from .management.commands.agendador_rodadas import CHAVE_METRICAS
+from .paginacao import pagina_por_chave
+from .roteador import leitura_replica
+from .liquidacao import (
+    OPCOES, aobter_resultado, escolher_vencedor, exposicao_da_rodada, liquidar_rodada,
+    multiplicador, registrar_exposicao,
+)
+from decimal import Decimal, InvalidOperation
+from asgiref.sync import sync_to_async
+import asyncio
 import json
 
 # --- 1. TELA DE LOADING (1% A 60%) ---
@@ -20,28 +39,24 @@ def loading_screen(request):
 # --- 2. CADASTRO COM LÓGICA DE CONVITE E PAÍS ---
 def cadastro_view(request):
     if request.method == 'POST':
-        telefone = request.POST.get('telefone')
+        telefone = (request.POST.get('telefone') or '').strip()
         password = request.POST.get('password')
-        pais = request.POST.get('pais')
+        pais = (request.POST.get('pais') or '').strip()
         invite_code = request.POST.get('invite_code')
 
-        if Usuario.objects.filter(telefone=telefone).exists():
+        # Criar usuário com a lógica de convite (a restrição unique deteta duplicados)
+        try:
+            user = Usuario.objects.cadastrar(telefone, password, pais, invite_code)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('cadastro')
+        except IntegrityError:
+            # Só a restrição unique do telefone é "número repetido"; outro erro sobe
+            if not Usuario.objects.filter(telefone=telefone).exists():
+                raise
             messages.error(request, "Este número já está cadastrado.")
             return redirect('cadastro')
 
-        # Criar usuário
-        user = Usuario.objects.create_user(telefone=telefone, password=password)
-        user.pais = pais
-        
-        # Lógica de Convite
-        if invite_code:
-            try:
-                padrinho = Usuario.objects.get(telefone=invite_code)
-                user.convidado_por = padrinho
-            except Usuario.DoesNotExist:
-                pass
-        
-        user.save()
         login(request, user)
         return redirect('loading')
 
@@ -52,12 +67,20 @@ def login_view(request):
     if request.method == 'POST':
         telefone = request.POST.get('username')
         senha = request.POST.get('password')
+
+        # Tentativas a mais para este telefone: recusa antes de calcular o hash da senha
+        if tentativas_login.bloqueado(telefone):
+            messages.error(request, "Demasiadas tentativas. Tente novamente dentro de alguns minutos.")
+            return render(request, 'plataforma/login.html', status=429)
+
         user = authenticate(request, telefone=telefone, password=senha)
         
         if user is not None:
+            tentativas_login.limpar(telefone)
             login(request, user)
             return redirect('loading')
         else:
+            tentativas_login.registar_falha(telefone)
             messages.error(request, "Telefone ou senha incorretos.")
     
     return render(request, 'plataforma/login.html')
@@ -71,25 +94,13 @@ def home_jogo(request):
     0-30 segundos: Fase de Apostas.
     30-40 segundos: Fase de Sorteio/Resultado.
     """
-    config = ConfiguracaoSistema.objects.first()
-    
-    # 1. Busca ou cria a rodada ativa
-    rodada_ativa = Rodada.objects.filter(ativa=True).last()
-    if not rodada_ativa:
-        rodada_ativa = Rodada.objects.create(ativa=True)
-
-    # 2. Cálculo do Tempo Universal (Sincroniza todos os navegadores)
-    agora = int(time.time())
-    tempo_no_ciclo = agora % 40  # Ciclo total de 40 segundos
-    
-    if tempo_no_ciclo < 30:
-        # Fase de Apostas (0 a 29 segundos)
-        fase_atual = "APOSTA"
-        tempo_restante = 30 - tempo_no_ciclo
-    else:
-        # Fase de Sorteio (30 a 39 segundos)
-        fase_atual = "SORTEIO"
-        tempo_restante = 40 - tempo_no_ciclo
+    config = obter_configuracao().config
+
+    # 1. Cálculo do Tempo Universal (Sincroniza todos os navegadores)
+    ciclo, fase_atual, tempo_restante = estado_ciclo()
+
+    # 2. Busca ou cria a rodada do ciclo atual
+    rodada_ativa = rodada_do_ciclo(ciclo)
 
     # 3. Retorno para o Template
     return render(request, 'plataforma/jogo.html', {
@@ -101,150 +112,200 @@ def home_jogo(request):
         'saldo_exibido': float(request.user.saldo)
     })
 
-# --- 5. LÓGICA DE APOSTA COM CONTROLO DE SALDO ---
+# --- 5. LÓGICA DE APOSTA COM CONTROLO DE SALDO (ASSÍNCRONA) ---
+VALOR_MAXIMO_APOSTA = Decimal('1000000')
+
+def _validar_aposta(numero_escolhido, valor_investido):
+    """
+    Converte e valida uma aposta: número entre as OPCOES e valor finito,
+    positivo, com no máximo 2 casas decimais e até VALOR_MAXIMO_APOSTA.
+    Levanta ValueError (ou InvalidOperation) se for inválida.
+    """
+    numero_escolhido = int(numero_escolhido)
+    valor_investido = Decimal(str(valor_investido))
+    if numero_escolhido not in OPCOES or not valor_investido.is_finite():
+        raise ValueError('Aposta inválida')
+    if not 0 < valor_investido <= VALOR_MAXIMO_APOSTA or valor_investido != valor_investido.quantize(CENTAVO):
+        raise ValueError('Aposta inválida')
+    return numero_escolhido, valor_investido
+
+def _registrar_aposta(usuario_id, rodada_id, numero_escolhido, valor_investido):
+    """
+    Parte transacional da aposta, corrida numa thread via sync_to_async:
+    o ORM assíncrono ainda não suporta transaction.atomic().
+    """
+    with transaction.atomic():
+        Rodada.bloquear_aberta(rodada_id)
+        nova_aposta = Aposta.objects.create(
+            usuario_id=usuario_id,
+            rodada_id=rodada_id,
+            valor_escolhido=numero_escolhido,
+            valor_investido=valor_investido
+        )
+        novo_saldo = Usuario.objects.movimentar_saldo(
+            usuario_id, -valor_investido, 'APOSTA', f'aposta:{nova_aposta.id}')
+        # Na mesma transação: uma aposta gravada conta sempre em TotalApostas, e a
+        # liquidação só confia nos contadores da cache se baterem com esse total.
+        # Com o bloqueio partilhado da rodada é a única linha disputada entre apostas:
+        # fica como último comando, para o bloqueio durar só até ao commit.
+        TotalApostas.objects.registrar_apostas(rodada_id, 1, valor_investido)
+    registrar_exposicao(rodada_id, [(numero_escolhido, valor_investido)])
+    return nova_aposta.id, novo_saldo
+
 @login_required
-def fazer_aposta(request):
+async def fazer_aposta(request):
+    """
+    Sob ASGI o worker não fica preso à espera da base de dados nos últimos
+    segundos da fase de apostas: enquanto uma aposta espera, atende as outras.
+    """
     if request.method == 'POST':
         try:
             # Converte e valida os dados recebidos
-            valor_investido = Decimal(request.POST.get('valor_investido', 0))
-            numero_escolhido = int(request.POST.get('numero_escolhido'))
-            usuario = request.user
-
-            # 1. Validação de Saldo
-            if usuario.saldo < valor_investido:
-                return JsonResponse({'erro': 'Saldo insuficiente!'}, status=400)
-
-            # 2. Busca a Rodada Ativa
-            rodada = Rodada.objects.filter(ativa=True).last()
-            
-            if not rodada:
-                rodada = Rodada.objects.create(ativa=True)
-
-            # 3. Criação da Aposta
-            nova_aposta = Aposta.objects.create(
-                usuario=usuario,
-                rodada=rodada,
-                valor_escolhido=numero_escolhido,
-                valor_investido=valor_investido
-            )
-            
-            # 4. Atualização do Saldo do Usuário (Retira o valor imediatamente)
-            usuario.saldo -= valor_investido
-            usuario.save()
-            
+            numero_escolhido, valor_investido = _validar_aposta(
+                request.POST.get('numero_escolhido'), request.POST.get('valor_investido', 0))
+            usuario = await request.auser()
+
+            # 1. Busca a Rodada do ciclo (apostas fecham no segundo 30)
+            ciclo, fase, _ = estado_ciclo()
+            if fase != "APOSTA":
+                return JsonResponse({'erro': 'Apostas encerradas para esta rodada.'}, status=400)
+            rodada = await arodada_do_ciclo(ciclo)
+
+            # 2. Criação da Aposta e débito condicional do saldo (mesma transação)
+            aposta_id, novo_saldo = await sync_to_async(_registrar_aposta)(
+                usuario.id, rodada.id, numero_escolhido, valor_investido)
+
             return JsonResponse({
                 'sucesso': 'Aposta realizada com sucesso!',
-                'aposta_id': nova_aposta.id,
-                'novo_saldo': float(usuario.saldo)
+                'aposta_id': aposta_id,
+                'rodada_id': rodada.id,
+                'novo_saldo': float(novo_saldo)
             })
 
-        except (ValueError, TypeError):
+        except SaldoInsuficiente:
+            return JsonResponse({'erro': 'Saldo insuficiente!'}, status=400)
+        except RodadaEncerrada:
+            return JsonResponse({'erro': 'Apostas encerradas para esta rodada.'}, status=400)
+        except (ValueError, TypeError, InvalidOperation):
             return JsonResponse({'erro': 'Dados de aposta inválidos.'}, status=400)
         except Exception as e:
             return JsonResponse({'erro': f'Erro interno: {str(e)}'}, status=500)
 
     return JsonResponse({'erro': 'Método inválido'}, status=405)
 
-# --- NOVA FUNÇÃO: PROCESSAR RESULTADO FINAL (CORREÇÃO DE SALDO) ---
+# --- 5.1 APOSTAS EM LOTE (VÁRIOS NÚMEROS NUM SÓ PEDIDO) ---
+MAX_APOSTAS_POR_LOTE = 20
+
 @login_required
-def processar_resultado_final(request):
+def fazer_apostas_lote(request):
     """
-    Esta função é chamada via AJAX para confirmar se o usuário ganhou ou perdeu.
-    Garante que o saldo não volte ao estado anterior ao recarregar a página.
+    Recebe várias apostas num só pedido JSON:
+    {"apostas": [{"numero_escolhido": 2, "valor_investido": 1000}, ...]}
+    Custa 1 INSERT em lote + 1 débito do total, independentemente do número de apostas.
+    O jogo.html faz uma aposta por rodada e usa /apostar/. Este endpoint é para
+    clientes da API que cobrem vários números na mesma rodada. O servidor não
+    limita as apostas por jogador, e N apostas passam a ser 1 pedido e
+    1 transação em vez de N.
     """
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            resultado_dado = int(data.get('resultado'))
-            aposta_id = data.get('aposta_id')
-
-            aposta = get_object_or_404(Aposta, id=aposta_id, usuario=request.user)
-            
-            # Evita processamento duplo
-            if aposta.ganhou is not None:
-                 return JsonResponse({'status': 'processado', 'novo_saldo': float(request.user.saldo)})
-
-            # Lógica de Ganho
-            if aposta.valor_escolhido == resultado_dado:
-                aposta.ganhou = True
-                lucro = aposta.valor_investido * Decimal(resultado_dado)
-                request.user.saldo += lucro # Adiciona o prêmio
-                request.user.save()
-            else:
-                aposta.ganhou = False
-                # O saldo já foi retirado em fazer_aposta, então aqui apenas confirmamos a perda no DB
-            
-            aposta.save()
+    if request.method != 'POST':
+        return JsonResponse({'erro': 'Método inválido'}, status=405)
 
-            return JsonResponse({
-                'ganhou': aposta.ganhou,
-                'novo_saldo': float(request.user.saldo)
-            })
-        except Exception as e:
-            return JsonResponse({'erro': str(e)}, status=500)
-    return JsonResponse({'erro': 'Inválido'}, status=400)
+    try:
+        itens = json.loads(request.body).get('apostas') or []
+        if not itens or len(itens) > MAX_APOSTAS_POR_LOTE:
+            return JsonResponse({'erro': f'Envie entre 1 e {MAX_APOSTAS_POR_LOTE} apostas.'}, status=400)
+        apostas = [_validar_aposta(item['numero_escolhido'], item['valor_investido']) for item in itens]
+    except (ValueError, TypeError, KeyError, AttributeError, InvalidOperation):
+        return JsonResponse({'erro': 'Dados de aposta inválidos.'}, status=400)
+
+    ciclo, fase, _ = estado_ciclo()
+    if fase != "APOSTA":
+        return JsonResponse({'erro': 'Apostas encerradas para esta rodada.'}, status=400)
+    rodada = rodada_do_ciclo(ciclo)
+
+    usuario = request.user
+    total = sum(valor for _, valor in apostas)
+    try:
+        with transaction.atomic():
+            Rodada.bloquear_aberta(rodada.id)
+            criadas = Aposta.objects.bulk_create([
+                Aposta(usuario=usuario, rodada=rodada, valor_escolhido=numero, valor_investido=valor)
+                for numero, valor in apostas
+            ])
+            usuario.saldo = Usuario.objects.movimentar_saldo(
+                usuario.id, -total, 'APOSTA', f'lote:rodada:{rodada.id}')
+            # Último comando antes do commit (ver _registrar_aposta)
+            TotalApostas.objects.registrar_apostas(rodada.id, len(criadas), total)
+    except SaldoInsuficiente:
+        return JsonResponse({'erro': 'Saldo insuficiente!'}, status=400)
+    except RodadaEncerrada:
+        return JsonResponse({'erro': 'Apostas encerradas para esta rodada.'}, status=400)
+    registrar_exposicao(rodada.id, apostas)
+
+    return JsonResponse({
+        'sucesso': f'{len(criadas)} apostas realizadas com sucesso!',
+        'apostas_ids': [aposta.id for aposta in criadas],
+        'rodada_id': rodada.id,
+        'novo_saldo': float(usuario.saldo)
+    })
+
+# --- NOVA FUNÇÃO: PROCESSAR RESULTADO FINAL (SÓ LEITURA) ---
+@login_required
+async def processar_resultado_final(request):
+    """
+    Esta função é chamada via AJAX depois do sorteio para mostrar se o usuário
+    ganhou ou perdeu. A rodada é liquidada uma única vez no servidor
+    (liquidar_rodada); aqui só se lê o resultado e o novo saldo, da cache,
+    sem nenhuma escrita. Antes da liquidação devolve {'status': 'pendente'}.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'erro': 'Método inválido'}, status=405)
+    try:
+        rodada_id = int(request.GET.get('rodada_id'))
+    except (TypeError, ValueError):
+        return JsonResponse({'erro': 'Rodada inválida.'}, status=400)
+
+    resultado = await aobter_resultado(rodada_id, await request.auser())
+    if resultado is None:
+        return JsonResponse({'status': 'pendente'})
+    return JsonResponse(resultado)
 
 # --- 6. LÓGICA DE DEPÓSITO ---
 @login_required
 def depositar(request):
-    config = ConfiguracaoSistema.objects.first()
-    bancos = MetodoBanco.objects.filter(ativo=True)
-    express = MetodoExpress.objects.filter(ativo=True)
-    referencias = MetodoReferencia.objects.filter(ativo=True)
-    valores_pre = config.valores_pre_definidos.split(',') if config else []
+    configuracao = obter_configuracao()
 
     if request.method == 'POST':
         metodo = request.POST.get('metodo')
         valor = request.POST.get('valor')
         nome = request.POST.get('nome_depositante')
         comprovativo = request.FILES.get('comprovativo')
+        if metodo not in dict(Deposito.METODOS):
+            messages.error(request, "Escolha um método de pagamento.")
+            return redirect('depositar')
 
-        Deposito.objects.create(
+        deposito = Deposito.objects.create(
             usuario=request.user,
             metodo=metodo,
             valor=valor,
             nome_depositante=nome,
             comprovativo=comprovativo
         )
+        # Compressão, miniatura e deduplicação do comprovativo fora deste pedido
+        agendar_processamento(deposito.id)
         messages.success(request, "Depósito enviado! Aguarde a aprovação.")
         return redirect('home_jogo')
 
     return render(request, 'plataforma/depositar.html', {
-        'config': config, 'bancos': bancos, 'express': express, 
-        'referencias': referencias, 'valores_pre': valores_pre
+        'config': configuracao.config, 'bancos': configuracao.bancos,
+        'express': configuracao.express, 'referencias': configuracao.referencias,
+        'valores_pre': configuracao.valores_pre
     })
 
 # --- 7. LÓGICA DE RESULTADO (CASA GANHA SEMPRE) ---
 def fechar_rodada_lucrativa(rodada_id):
-    rodada = Rodada.objects.get(id=rodada_id)
-    opcoes = [0, 2, 3, 4, 5, 6]
-    gastos_por_opcao = {}
-    
-    for opt in opcoes:
-        total_apostado = Aposta.objects.filter(rodada=rodada, valor_escolhido=opt).aggregate(Sum('valor_investido'))['valor_investido__sum'] or 0
-        if opt == 0:
-            gastos_por_opcao[opt] = total_apostado
-        else:
-            gastos_por_opcao[opt] = total_apostado * opt
-
-    numero_vencedor = min(gastos_por_opcao, key=gastos_por_opcao.get)
-    rodada.numero_sorteado = numero_vencedor
-    rodada.ativa = False
-    rodada.save()
-
-    apostas = Aposta.objects.filter(rodada=rodada)
-    for aposta in apostas:
-        if aposta.valor_escolhido == numero_vencedor:
-            aposta.ganhou = True
-            if numero_vencedor == 0:
-                aposta.usuario.saldo += aposta.valor_investido
-            else:
-                aposta.usuario.saldo += (aposta.valor_investido * Decimal(numero_vencedor))
-            aposta.usuario.save()
-        else:
-            aposta.ganhou = False
-        aposta.save()
+    """Ver plataforma.liquidacao.liquidar_rodada (liquidação em lote, numa transação)."""
+    return liquidar_rodada(rodada_id)
 
 # --- 8. SAQUE ---
 @login_required
@@ -255,34 +316,170 @@ def sacar(request):
             messages.error(request, "O valor mínimo para saque é 2500 Kz.")
             return redirect('sacar')
         
-        if request.user.saldo >= valor:
-            Saque.objects.create(usuario=request.user, valor=valor)
-            request.user.saldo -= valor
-            request.user.save()
+        try:
+            with transaction.atomic():
+                saque = Saque.objects.create(usuario=request.user, valor=valor)
+                request.user.saldo = Usuario.objects.movimentar_saldo(
+                    request.user.id, -valor, 'SAQUE', f'saque:{saque.id}')
             messages.success(request, "Pedido de saque realizado!")
-        else:
+        except SaldoInsuficiente:
             messages.error(request, "Saldo insuficiente.")
-            
+
     return render(request, 'plataforma/sacar.html', {'usuario': request.user})
 
 # --- 9. EQUIPA E CONVITE ---
 @login_required
+@leitura_replica
 def pagina_convite(request):
-    subordinados = Usuario.objects.filter(convidado_por=request.user)
+    # Totais vêm das estatísticas já guardadas no utilizador; a lista é paginada por chave
+    subordinados = Usuario.objects.filter(convidado_por=request.user).only('id', 'telefone', 'pais')
+    try:
+        subordinados, proximo = pagina_por_chave(subordinados, ('-id',), request.GET.get('cursor'))
+    except (ValueError, ValidationError):
+        subordinados, proximo = pagina_por_chave(subordinados, ('-id',))
     return render(request, 'plataforma/convite.html', {
         'usuario': request.user,
         'subordinados': subordinados,
-        'total_sub': subordinados.count()
+        'proximo': proximo,
+        'total_sub': request.user.total_subordinados,
+        'sub_ativos': request.user.subordinados_ativos,
+        'comissao_total': request.user.comissao_total,
     })
 
-# --- 10. HISTÓRICO ---
+# --- 10. HISTÓRICO (PAGINADO POR CHAVE) ---
+# Cada tipo de histórico: (consulta base, ordenação keyset, serialização para JSON)
+HISTORICO = {
+    'apostas': (
+        lambda usuario: Aposta.objects.filter(usuario=usuario).select_related('rodada').only(
+            'id', 'valor_escolhido', 'valor_investido', 'ganhou', 'rodada__numero_sorteado'),
+        ('-id',),
+        lambda a: {
+            'id': a.id, 'valor_escolhido': a.valor_escolhido,
+            'valor_investido': str(a.valor_investido), 'ganhou': a.ganhou,
+            'numero_sorteado': a.rodada.numero_sorteado,
+        },
+    ),
+    # Apostas já arquivadas (arquivar_rodadas): uma linha por dia, mais antigas que as de cima
+    'resumos': (
+        lambda usuario: ResumoApostasDiario.objects.filter(usuario=usuario),
+        ('-dia', '-id'),
+        lambda r: {
+            'id': r.id, 'dia': date_format(r.dia, 'd/m/Y'), 'quantidade': r.quantidade,
+            'vitorias': r.vitorias, 'total_investido': str(r.total_investido),
+            'total_ganho': str(r.total_ganho),
+        },
+    ),
+    'depositos': (
+        lambda usuario: Deposito.objects.filter(usuario=usuario).only(
+            'id', 'metodo', 'valor', 'status', 'data_criacao'),
+        ('-data_criacao', '-id'),
+        lambda d: {
+            'id': d.id, 'metodo': d.metodo, 'valor': str(d.valor), 'status': d.status,
+            'data': date_format(localtime(d.data_criacao), 'd/m/Y H:i'),
+        },
+    ),
+    'saques': (
+        lambda usuario: Saque.objects.filter(usuario=usuario).only(
+            'id', 'valor', 'status', 'data_pedido'),
+        ('-data_pedido', '-id'),
+        lambda s: {
+            'id': s.id, 'valor': str(s.valor), 'status': s.status,
+            'data': date_format(localtime(s.data_pedido), 'd/m/Y H:i'),
+        },
+    ),
+}
+
 @login_required
+@leitura_replica
 def historico_view(request):
-    apostas = Aposta.objects.filter(usuario=request.user).order_by('-id')
-    depositos = Deposito.objects.filter(usuario=request.user).order_by('-data_criacao')
-    saques = Saque.objects.filter(usuario=request.user).order_by('-data_pedido')
-    
-    return render(request, 'plataforma/historico.html', {
-        'apostas': apostas, 'depositos': depositos, 'saques': saques
+    contexto = {}
+    for tipo, (consulta, ordem, _) in HISTORICO.items():
+        itens, proximo = pagina_por_chave(consulta(request.user), ordem)
+        contexto[tipo] = itens
+        contexto[f'proximo_{tipo}'] = proximo
+    return render(request, 'plataforma/historico.html', contexto)
+
+@login_required
+@leitura_replica
+def historico_api(request):
+    """Devolve a página seguinte de um tipo de histórico (scroll incremental)."""
+    tipo = request.GET.get('tipo')
+    if tipo not in HISTORICO:
+        return JsonResponse({'erro': 'Tipo inválido'}, status=400)
+
+    consulta, ordem, serializar = HISTORICO[tipo]
+    try:
+        itens, proximo = pagina_por_chave(consulta(request.user), ordem, request.GET.get('cursor'))
+    except (ValueError, ValidationError):
+        return JsonResponse({'erro': 'Cursor inválido'}, status=400)
+    return JsonResponse({'itens': [serializar(item) for item in itens], 'proximo': proximo})
+
+# --- 11. EVENTOS EM TEMPO REAL (SSE, SÓ SOB ASGI) ---
+@login_required
+async def eventos_rodada(request):
+    """
+    Canal Server-Sent Events com as mudanças de fase e o número sorteado.
+    Só funciona servido por core.asgi; sob WSGI devolve 204 e o jogo continua
+    com o relógio local (o EventSource não volta a tentar depois de um 204).
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    async def fluxo():
+        # Subscreve só quando o fluxo começa: se o cliente sair antes, não fica
+        # uma fila órfã (o finally só corre depois de o gerador arrancar)
+        fila = difusor.subscrever()
+        try:
+            ciclo, fase, restante = estado_ciclo()
+            yield formatar_evento('fase', {'ciclo': ciclo, 'fase': fase, 'restante': restante})
+            if 'resultado' in difusor.ultimos:
+                yield formatar_evento('resultado', difusor.ultimos['resultado'])
+            while True:
+                try:
+                    evento, dados = await asyncio.wait_for(fila.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield formatar_evento(evento, dados)
+        finally:
+            difusor.cancelar(fila)
+
+    resposta = StreamingHttpResponse(fluxo(), content_type='text/event-stream')
+    resposta['Cache-Control'] = 'no-cache'
+    resposta['X-Accel-Buffering'] = 'no'
+    return resposta
+
+# --- 12. MÉTRICAS (SÓ STAFF, FORMATO PROMETHEUS) ---
+@staff_member_required
+def metricas(request):
+    """Latência e consultas por view deste processo (ver plataforma.instrumentacao) e o agendador."""
+    linhas = [registo.prometheus()]
+    agendador = cache.get(CHAVE_METRICAS) or {}
+    for campo, valor in sorted(agendador.items()):
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            linhas.append(f'# TYPE jogo_agendador_{campo} gauge\njogo_agendador_{campo} {valor}\n')
+    return HttpResponse(''.join(linhas), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# --- 13. EXPOSIÇÃO DA RODADA EM TEMPO REAL (SÓ STAFF) ---
+@staff_member_required
+def exposicao_rodada(request):
+    """Quanto custaria cada número se saísse agora, para a rodada do ciclo atual."""
+    ciclo, fase, tempo_restante = estado_ciclo()
+    rodada = rodada_do_ciclo(ciclo)
+    quantidade, totais, em_cache = exposicao_da_rodada(rodada.id)
+    return JsonResponse({
+        'rodada_id': rodada.id,
+        'fase': fase,
+        'tempo_restante': tempo_restante,
+        'apostas': quantidade,
+        'fonte': 'cache' if em_cache else 'base_de_dados',
+        'opcoes': [
+            {
+                'opcao': opcao,
+                'total_apostado': float(totais.get(opcao) or 0),
+                'custo_se_sair': float((totais.get(opcao) or 0) * multiplicador(opcao)),
+            }
+            for opcao in OPCOES
+        ],
+        'vencedor_atual': escolher_vencedor(totais),
     })
-    
\ No newline at end of file